@@ -19,9 +19,50 @@ def chat_node(state: ChatState):
     response = llm.invoke(messages)
     return {"messages": [response]}
 
+class ThreadIndexedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver that also keeps a `threads` table with one row per thread and
+    its latest checkpoint id, so threads can be listed without scanning and
+    deserializing every checkpoint.
+    """
+
+    def setup(self):
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                last_checkpoint_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS threads_by_activity ON threads (last_checkpoint_id);
+        """)
+        # Backfill threads written before the registry existed (reads the primary key index only)
+        self.conn.execute("""
+            INSERT OR IGNORE INTO threads (thread_id, last_checkpoint_id)
+            SELECT thread_id, MAX(checkpoint_id) FROM checkpoints WHERE checkpoint_ns = '' GROUP BY thread_id
+        """)
+        self.conn.commit()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        if not config["configurable"].get("checkpoint_ns"):
+            with self.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO threads (thread_id, last_checkpoint_id) VALUES (?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET last_checkpoint_id = excluded.last_checkpoint_id",
+                    (str(config["configurable"]["thread_id"]), checkpoint["id"]),
+                )
+        return next_config
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM threads WHERE thread_id = ?", (str(thread_id),))
+
 conn = sqlite3.connect(database='chatbot.db', check_same_thread=False)
 # Checkpointer
-checkpointer = SqliteSaver(conn=conn)
+checkpointer = ThreadIndexedSqliteSaver(conn=conn)
 
 graph = StateGraph(ChatState)
 graph.add_node("chat_node", chat_node)
@@ -31,10 +72,9 @@ graph.add_edge("chat_node", END)
 chatbot = graph.compile(checkpointer=checkpointer)
 
 def retrieve_all_threads():
-    all_threads = set()
-    for checkpoint in checkpointer.list(None):
-        all_threads.add(checkpoint.config['configurable']['thread_id'])
-
-    return list(all_threads)
+    # Oldest activity first; the sidebar lists them in reverse
+    with checkpointer.cursor(transaction=False) as cur:
+        cur.execute("SELECT thread_id FROM threads ORDER BY last_checkpoint_id")
+        return [row[0] for row in cur.fetchall()]
 
 
@@ -7,7 +7,8 @@ import asyncio
 from langgraph_tool_backend import (
     chatbot,
     load_conversation_from_checkpointer, # Load from agent state
-    store_conversation,
+    create_conversation,
+    update_conversation_stats,
     retrieve_all_threads_db,
     store_conversation_name,
     register_user,
@@ -45,8 +46,8 @@ async def create_new_chat_in_db(username: str):
     # For simplicity, let's use a generic name.
     default_name = f"New Conversation" 
 
-    # Store the new, empty conversation in the database
-    await store_conversation(thread_id, username, [], default_name)
+    # Register the new conversation in the database; its messages live in the checkpointer
+    await create_conversation(thread_id, username, default_name)
 
 # Utility to convert LangChain messages to Streamlit format
 def format_messages(messages):
@@ -318,11 +319,10 @@ if user_input:
 
         st.session_state['message_history'].append({'role':'assistant','content':ai_message})
         
-        run_async(store_conversation(
+        run_async(update_conversation_stats(
             str(st.session_state['thread_id']),
             current_username,
-            st.session_state['message_history'],
-            st.session_state['thread_names'][str(st.session_state['thread_id'])]
+            len(st.session_state['message_history'])
         ))
         
         st.rerun()
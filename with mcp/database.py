@@ -16,11 +16,42 @@ async def init_db(conn: aiosqlite.Connection):
         thread_id TEXT PRIMARY KEY,
         username TEXT NOT NULL,
         conversation_name TEXT NOT NULL,
-        messages TEXT
+        created_at TEXT,
+        updated_at TEXT,
+        message_count INTEGER DEFAULT 0
     )
     ''')
+    await _migrate_conversations(conn)
     await conn.commit()
 
+async def _migrate_conversations(conn: aiosqlite.Connection):
+    """
+    Older databases kept a full JSON copy of every chat in conversations.messages.
+    History now lives only in the checkpointer, so the table keeps metadata only.
+    """
+    async with conn.execute("PRAGMA table_info(conversations)") as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    for column, column_type in (("created_at", "TEXT"), ("updated_at", "TEXT"), ("message_count", "INTEGER DEFAULT 0")):
+        if column not in columns:
+            await conn.execute(f"ALTER TABLE conversations ADD COLUMN {column} {column_type}")
+    if "messages" not in columns:
+        return
+
+    # Backfill the message count before the copy is dropped
+    async with conn.execute("SELECT thread_id, messages FROM conversations WHERE messages IS NOT NULL") as cursor:
+        rows = await cursor.fetchall()
+    for thread_id, messages in rows:
+        try:
+            count = len(json.loads(messages))
+        except ValueError:
+            continue
+        await conn.execute("UPDATE conversations SET message_count=? WHERE thread_id=?", (count, thread_id))
+    try:
+        await conn.execute("ALTER TABLE conversations DROP COLUMN messages")
+    except aiosqlite.OperationalError:
+        # SQLite older than 3.35 cannot drop columns; just release the data
+        await conn.execute("UPDATE conversations SET messages=NULL")
+
 async def increment_ai_count(conn: aiosqlite.Connection, username: str) -> int:
     async with conn.execute("SELECT ai_count FROM users WHERE username=?", (username,)) as cursor:
         row = await cursor.fetchone()
@@ -32,18 +63,20 @@ async def increment_ai_count(conn: aiosqlite.Connection, username: str) -> int:
         return ai_count
     return 0
 
-async def store_conversation(conn: aiosqlite.Connection, thread_id, username, messages, conversation_name):
-    messages_json = json.dumps(messages)
+async def create_conversation(conn: aiosqlite.Connection, thread_id, username, conversation_name):
     await conn.execute('''
-        INSERT OR REPLACE INTO conversations (thread_id, username, conversation_name, messages)
-        VALUES (?, ?, ?, ?)
-    ''', (str(thread_id), username, conversation_name, messages_json))
+        INSERT OR IGNORE INTO conversations (thread_id, username, conversation_name, created_at, updated_at, message_count)
+        VALUES (?, ?, ?, datetime('now'), datetime('now'), 0)
+    ''', (str(thread_id), username, conversation_name))
     await conn.commit()
 
-async def load_conversation(conn: aiosqlite.Connection, thread_id, username):
-    async with conn.execute("SELECT messages FROM conversations WHERE thread_id=? AND username=?", (thread_id, username)) as cursor:
-        row = await cursor.fetchone()
-    return json.loads(row[0]) if row and row[0] else []
+async def update_conversation_stats(conn: aiosqlite.Connection, thread_id, username, message_count):
+    """Records a finished turn. The messages themselves are stored by the checkpointer."""
+    await conn.execute(
+        "UPDATE conversations SET updated_at=datetime('now'), message_count=? WHERE thread_id=? AND username=?",
+        (message_count, str(thread_id), username),
+    )
+    await conn.commit()
 
 async def retrieve_all_threads(conn: aiosqlite.Connection, username):
     async with conn.execute("SELECT thread_id, conversation_name FROM conversations WHERE username=? ORDER BY rowid", (username,)) as cursor:
@@ -10,8 +10,8 @@ from auth import register_user as auth_register_user, login_user as auth_login_u
 from database import (
     init_db,
     increment_ai_count as db_increment_ai_count,
-    store_conversation as db_store_conversation,
-    load_conversation as db_load_conversation,
+    create_conversation as db_create_conversation,
+    update_conversation_stats as db_update_conversation_stats,
     retrieve_all_threads as db_retrieve_all_threads,
     store_conversation_name as db_store_conversation_name,
     delete_conversation as db_delete_conversation,
@@ -41,8 +41,8 @@ login_user = partial(auth_login_user, conn)
 
 # Database functions for UI state and user management
 increment_ai_count = partial(db_increment_ai_count, conn)
-store_conversation = partial(db_store_conversation, conn)
-load_conversation_db = partial(db_load_conversation, conn) 
+create_conversation = partial(db_create_conversation, conn)
+update_conversation_stats = partial(db_update_conversation_stats, conn)
 retrieve_all_threads_db = partial(db_retrieve_all_threads, conn)
 store_conversation_name = partial(db_store_conversation_name, conn)
 delete_conversation = partial(db_delete_conversation, conn)
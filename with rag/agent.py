@@ -1,19 +1,20 @@
 from typing import TypedDict, Annotated
 from dotenv import load_dotenv
-import requests
-from langchain_core.messages import BaseMessage, SystemMessage
+import httpx
+from langchain_core.messages import BaseMessage, SystemMessage, AIMessage, HumanMessage, message_chunk_to_message
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph.message import add_messages
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_core.tools import tool, BaseTool
 from langchain_mcp_adapters.client import MultiServerMCPClient
 import asyncio
 import threading
+import time
 import os
+from collections import OrderedDict
 import tempfile
 import aiosqlite
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -22,6 +23,22 @@ from langchain_community.vectorstores import FAISS
 
 # Import db functions
 from database import add_document, get_document_for_thread
+from codec import CompressedSerializer
+from hybrid_checkpointer import HybridCheckpointer
+from delta_checkpointer import DeltaSqliteSaver
+from context_window import window_messages, HISTORY_TOKEN_BUDGET
+from summary_memory import SummaryMemory, summary_message, unsummarized_start
+from blob_store import externalize, rehydrate_current_turn
+from tool_executor import ConcurrentToolNode
+from stock_quotes import QuoteClient
+from tool_cache import ToolResultCache
+from semantic_cache import SemanticCache, cache_context
+from safe_math import evaluate, format_number, route_arithmetic, ExpressionError
+from batch_calc import batch_calculate
+from llm_providers import get_llm
+from tool_selector import ToolSelector
+from turn_metrics import MetricsWriter, usage_row, tool_row
+from stream_bridge import StreamBridge
 
 load_dotenv()
 
@@ -40,8 +57,13 @@ def submit_async_task(coro):
     """Schedule a coroutine on the backend event loop."""
     return _submit_async(coro)
 
+def open_stream_bridge(**kwargs) -> StreamBridge:
+    """Bounded bridge from a stream produced on the backend event loop to the calling thread."""
+    return StreamBridge(_ASYNC_LOOP, **kwargs)
+
 # ---------------- LLM Setup ----------------
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.7)
+# Provider chosen by LLM_PROVIDER (gemini by default, standin for offline load tests)
+llm = get_llm()
 embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
 
 
@@ -50,6 +72,34 @@ VECTORSTORE_DIR = "vectorstores"
 if not os.path.exists(VECTORSTORE_DIR):
     os.makedirs(VECTORSTORE_DIR)
 
+# Loaded FAISS indexes, most recently used last
+MAX_CACHED_VECTORSTORES = 8
+_vectorstores: OrderedDict = OrderedDict()
+
+def _has_vectorstore(thread_id: str) -> bool:
+    return os.path.exists(os.path.join(VECTORSTORE_DIR, f"{thread_id}.faiss"))
+
+async def load_vectorstore(thread_id: str):
+    """Load the thread's FAISS index from disk, or return the cached one. None if there is none."""
+    vectorstore_path = os.path.join(VECTORSTORE_DIR, f"{thread_id}.faiss")
+    if not os.path.exists(vectorstore_path):
+        _vectorstores.pop(thread_id, None)
+        return None
+    if thread_id in _vectorstores:
+        _vectorstores.move_to_end(thread_id)
+        return _vectorstores[thread_id]
+
+    faiss_index = await asyncio.to_thread(
+        FAISS.load_local,
+        folder_path=vectorstore_path,
+        embeddings=embeddings,
+        allow_dangerous_deserialization=True
+    )
+    _vectorstores[thread_id] = faiss_index
+    while len(_vectorstores) > MAX_CACHED_VECTORSTORES:
+        _vectorstores.popitem(last=False)
+    return faiss_index
+
 # ---------------- PDF Ingestion ----------------
 async def ingest_pdf(conn: aiosqlite.Connection, file_bytes: bytes, thread_id: str, filename: str) -> dict:
     """
@@ -77,6 +127,7 @@ async def ingest_pdf(conn: aiosqlite.Connection, file_bytes: bytes, thread_id: s
         # Save the vector store
         vectorstore_path = os.path.join(VECTORSTORE_DIR, f"{thread_id}.faiss")
         await asyncio.to_thread(vector_store.save_local, vectorstore_path)
+        _vectorstores.pop(thread_id, None)
 
         doc_info = {
             "filename": filename,
@@ -123,14 +174,59 @@ def calculator(first_num: float, second_num: float, operation: str) -> dict:
         return {"error": str(e)}
 
 @tool
-def get_stock_price(symbol: str) -> dict:
+def calculate_expression(expression: str) -> dict:
+    """
+    Evaluate a full arithmetic expression, e.g. "(1200 - 350) * 1.07 ^ 3",
+    "12% of 1,250" or "3 km + 200 m in mi". Supports parentheses, ^ for powers,
+    sqrt/log/sin/round/min/max and common length, mass, time, volume and data units.
+    """
+    try:
+        value, unit = evaluate(expression)
+    except (ExpressionError, ArithmeticError) as e:
+        return {"error": str(e), "expression": expression}
+    return {"expression": expression, "result": value, "unit": unit, "formatted": format_number(value) + (f" {unit}" if unit else "")}
+
+@tool
+def batch_calculator(
+    values: list[float],
+    operation: str,
+    operand: float | None = None,
+    other: list[float] | None = None,
+    rate: float | None = None,
+    periods: int = 1,
+    percentiles: list[float] | None = None,
+    labels: list[str] | None = None,
+    aggregate: str = "sum",
+) -> dict:
+    """
+    Run one calculation over a whole list of numbers at once. Prefer this over
+    repeated calculator calls whenever more than two numbers are involved.
+    operation is one of:
+    - add, sub, mul, div, pow: elementwise with a scalar `operand` or an equally long `other` list
+    - sum, mean, median, min, max, std, var, prod, count
+    - percentile (with `percentiles`, e.g. [10, 50, 90]) or describe for a full summary
+    - cumsum, cumprod, pct_change (period-over-period change in %)
+    - compound: grow every value by `rate` (0.07 for 7%) for `periods` periods
+    - groupby: aggregate ("sum", "mean", "count", "min", "max") values per entry of `labels`
+    """
+    try:
+        return batch_calculate(values, operation, operand, other, rate, periods, percentiles, labels, aggregate)
+    except ValueError as e:
+        return {"error": str(e), "operation": operation}
+
+# Shared pooled client; repeated tickers are served from its TTL cache
+quote_client = QuoteClient()
+
+@tool
+async def get_stock_price(symbol: str) -> dict:
     """
     Fetch latest stock price for a given symbol (e.g. 'AAPL', 'TSLA') 
-    using Alpha Vantage with API key in the URL.
+    using Alpha Vantage.
     """
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey=8S6VBWTFZH9U6HDA"
-    r = requests.get(url)
-    return r.json()
+    try:
+        return await quote_client.get_quote(symbol)
+    except httpx.HTTPError as e:
+        return {"error": f"Could not fetch quote for {symbol}: {e!r}", "symbol": symbol}
 
 @tool
 async def rag_tool(query: str, thread_id: str = None) -> dict:
@@ -153,20 +249,13 @@ async def rag_tool(query: str, thread_id: str = None) -> dict:
             "query": query,
         }
     
-    vectorstore_path = os.path.join(VECTORSTORE_DIR, f"{thread_id}.faiss")
-    if not os.path.exists(vectorstore_path):
-        return {
-            "error": f"Vector store not found for this thread. (Thread ID: {thread_id})",
-            "query": query,
-        }
-
     try:
-        faiss_index = await asyncio.to_thread(
-            FAISS.load_local,
-            folder_path=vectorstore_path,
-            embeddings=embeddings,
-            allow_dangerous_deserialization=True
-        )
+        faiss_index = await load_vectorstore(thread_id)
+        if faiss_index is None:
+            return {
+                "error": f"Vector store not found for this thread. (Thread ID: {thread_id})",
+                "query": query,
+            }
         
         retriever = faiss_index.as_retriever(search_type="similarity", search_kwargs={"k": 4})
         result = await retriever.ainvoke(query)
@@ -204,22 +293,124 @@ def load_mcp_tools() -> list[BaseTool]:
 
 mcp_tools = load_mcp_tools()
 
-tools = [search_tool, get_stock_price, calculator, rag_tool, *mcp_tools]
-llm_with_tools = llm.bind_tools(tools) if tools else llm
+tools = [search_tool, get_stock_price, calculator, calculate_expression, batch_calculator, rag_tool, *mcp_tools]
+# Only the tools relevant to each turn are bound, which keeps tool schemas out of most prompts
+tool_selector = ToolSelector(llm, embeddings, tools) if tools else None
 
 # ---------------- Chat State ----------------
 class ChatState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    # Rolling summary of the messages up to and including the one with id `summarized_through`
+    summary: str
+    summarized_through: str
+
+summary_memory = SummaryMemory(llm)
+semantic_cache = SemanticCache(embeddings)
+
+async def cached_answer(state: ChatState, configurable: dict):
+    """
+    Look the turn's prompt up in the semantic cache. Returns (answer or None,
+    lookup) where lookup is kept to store the fresh answer on a miss.
+    Threads with an indexed PDF are skipped, since their answers depend on it.
+    """
+    eligible = cache_context(state["messages"])
+    thread_id = configurable.get("thread_id")
+    if eligible is None or (thread_id and _has_vectorstore(thread_id)):
+        return None, None
+    prompt, context_key = eligible
+    scope_key = semantic_cache.scope_key(configurable.get("username"), configurable.get("semantic_cache_scope"))
+    try:
+        answer, vector = await semantic_cache.lookup(prompt, scope_key, context_key)
+    except Exception as e:
+        print(f"Semantic cache lookup failed: {e}")
+        return None, None
+    return answer, (vector, scope_key, context_key)
+
+async def replay_answer(answer: str, messages: list[BaseMessage], source: str) -> AIMessage:
+    """Stream a ready answer through a fake chat model so the UI renders it like a live one."""
+    response = await GenericFakeChatModel(messages=iter([AIMessage(content=answer)])).ainvoke(messages)
+    response.response_metadata = {**response.response_metadata, "answered_by": source}
+    return response
+
+# Per-node latency, token and cost rows, written to turn_metrics off the hot path
+metrics = MetricsWriter()
+
+async def timed_model_call(model, messages: list[BaseMessage]) -> tuple[AIMessage, float | None]:
+    """
+    Stream one model call, returning the response and its time to first token
+    in ms. A stream that ends without a single chunk is retried once without
+    streaming; the response is then flagged `stream_failed` in its metadata.
+    """
+    start = time.perf_counter()
+    ttft_ms = None
+    response = None
+    async for chunk in model.astream(messages):
+        if ttft_ms is None and (chunk.content or chunk.tool_call_chunks):
+            ttft_ms = (time.perf_counter() - start) * 1000
+        response = chunk if response is None else response + chunk
+    if response is not None:
+        return message_chunk_to_message(response), ttft_ms
+
+    print("Model stream ended without any chunk; retrying without streaming")
+    try:
+        response = await model.ainvoke(messages)
+    except Exception as e:
+        print(f"Model call failed after an empty stream: {e}")
+        response = AIMessage(content="")
+    response.response_metadata = {**response.response_metadata, "stream_failed": True}
+    return response, None
 
 # ---------------- Chat Node ----------------
 async def chat_node(state: ChatState, config=None):
     """LLM node that may answer or request a tool call."""
-    messages = state["messages"]
+    start = time.perf_counter()
+    configurable = (config or {}).get("configurable", {})
+    last = state["messages"][-1] if state["messages"] else None
+    # Plain arithmetic is answered locally instead of with two model round-trips
+    if isinstance(last, HumanMessage) and isinstance(last.content, str):
+        answer = route_arithmetic(last.content)
+        if answer is not None:
+            response = await replay_answer(answer, state["messages"], "arithmetic")
+            metrics.record(config, "chat_node", wall_ms=(time.perf_counter() - start) * 1000, outcome="arithmetic")
+            return {"messages": [response]}
+
+    answer, lookup = await cached_answer(state, configurable)
+    if answer is not None:
+        response = await replay_answer(answer, state["messages"], "semantic_cache")
+        metrics.record(config, "chat_node", wall_ms=(time.perf_counter() - start) * 1000, outcome="semantic_cache")
+        return {"messages": [response]}
+
+    # Turns already folded into the summary are replaced by the summary itself
+    messages = state["messages"][unsummarized_start(state):]
+    if state.get("summary"):
+        messages = [summary_message(state["summary"]), *messages]
+    # Large tool outputs are kept as blob references; load them for the turn in progress.
+    # This comes before windowing, so the budget counts the full tool outputs.
+    messages = await rehydrate_current_turn(messages)
+    # Only a token-budgeted window of the history is sent to the model
+    messages = window_messages(
+        messages,
+        max_tokens=configurable.get("history_token_budget", HISTORY_TOKEN_BUDGET),
+    )
     
-    response = await llm_with_tools.ainvoke(messages)
+    if tool_selector is None:
+        response, ttft_ms = await timed_model_call(llm, messages)
+    else:
+        thread_id = configurable.get("thread_id")
+        # rag_tool is always offered in threads that have an indexed PDF
+        extra = ("rag_tool",) if thread_id and _has_vectorstore(thread_id) else ()
+        llm_with_tools, bound_tools = await tool_selector.select(state["messages"], extra, thread_id)
+        response, ttft_ms = await timed_model_call(llm_with_tools, messages)
+        tool_selector.record_response(response, bound_tools, messages)
+    # Wall time covers the whole node: windowing, rehydration and tool selection included
+    metrics.record(
+        config, "chat_node",
+        **usage_row(response, ttft_ms, (time.perf_counter() - start) * 1000),
+        outcome="failed" if response.response_metadata.get("stream_failed") else "tool_calls" if response.tool_calls else "answer",
+    )
 
     if hasattr(response, "tool_calls") and response.tool_calls:
-        thread_id = config.get("configurable", {}).get("thread_id")
+        thread_id = configurable.get("thread_id")
         if thread_id:
             for call in response.tool_calls:
                 if call.get('name') == 'rag_tool':
@@ -227,23 +418,42 @@ async def chat_node(state: ChatState, config=None):
                         call['args'] = {}
                     if 'thread_id' not in call['args'] or not call['args']['thread_id']:
                         call['args']['thread_id'] = thread_id
+    elif lookup is not None and SemanticCache.cacheable_answer(response):
+        semantic_cache.store(*lookup, response.content)
     
     return {"messages": [response]}
 
-tool_node = ToolNode(tools) if tools else None
+# Results of deterministic and slow tools are shared across users for a short TTL.
+# Set TOOL_CACHE_DB to share them across worker processes as well.
+tool_cache = ToolResultCache(db_path=os.getenv("TOOL_CACHE_DB"))
+tool_cache.register_mcp_tools(mcp_tools)
+
+# Tool calls of one step run concurrently, each with its own timeout
+tool_node = ConcurrentToolNode(tools, cache=tool_cache) if tools else None
+
+async def tools_with_blob_store(state: ChatState, config=None):
+    """Runs the tools, then moves large outputs out of the graph state into the blob store."""
+    result = await tool_node.ainvoke(state, config)
+    for message in result["messages"]:
+        metrics.record(config, "tools", **tool_row(message))
+    return {"messages": [await externalize(m) for m in result["messages"]]}
 
 # ---------------- Agent Creation ----------------
 def create_agent(conn):
-    checkpointer = AsyncSqliteSaver(conn=conn)
+    # Hot threads are served from memory and written through to SQLite in the background
+    checkpointer = HybridCheckpointer(DeltaSqliteSaver(conn=conn, serde=CompressedSerializer()))
     graph = StateGraph(ChatState)
     graph.add_node("chat_node", chat_node)
     graph.add_edge(START, "chat_node")
 
     if tool_node:
-        graph.add_node("tools", tool_node)
-        graph.add_conditional_edges("chat_node", tools_condition)
+        graph.add_node("tools", tools_with_blob_store)
+        graph.add_conditional_edges("chat_node", tools_condition, {"tools": "tools", END: END})
         graph.add_edge("tools", "chat_node")
     else:
         graph.add_edge("chat_node", END)
 
-    return graph.compile(checkpointer=checkpointer)
\ No newline at end of file
+    chatbot = graph.compile(checkpointer=checkpointer)
+    summary_memory.graph = chatbot
+    metrics.conn, metrics.lock = conn, checkpointer.lock
+    return chatbot
\ No newline at end of file
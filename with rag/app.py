@@ -1,6 +1,5 @@
 import streamlit as st
 from streamlit_cookies_manager import EncryptedCookieManager
-import queue
 import uuid
 import asyncio
 import os
@@ -8,8 +7,9 @@ import shutil
 
 from langgraph_mcp_tool_rag_backend import (
     chatbot,
-    load_conversation_from_checkpointer, # Load from agent state
-    store_conversation,
+    load_conversation_from_checkpointer, # Load formatted history from agent state
+    create_conversation,
+    update_conversation_stats,
     retrieve_all_threads_db,
     store_conversation_name,
     register_user,
@@ -18,14 +18,22 @@ from langgraph_mcp_tool_rag_backend import (
     delete_conversation,
     run_async,
     submit_async_task,
+    open_stream_bridge, # Bounded, cancellable stream from the backend loop
+    stream_turn, # Token deltas and tool start/end of one turn
+    start_run, # Cancellation handle per streamed turn
+    attach_run,
+    stop_run,
     add_document, # New: Add document info to DB
     get_document_for_thread, # New: Get document info from DB
     ingest_pdf, # New: PDF ingestion function
+    prefetch_recent_threads, # Warm recent threads after login
+    cancel_prefetch,
 )
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, AIMessageChunk
 from agent import VECTORSTORE_DIR # Import the directory where vectorstores are saved
 
 MAX_AI_SEARCHES = 200
+# Set STREAM_DEBUG=1 to print the stream statistics of every turn
+STREAM_DEBUG = os.getenv("STREAM_DEBUG") == "1"
 
 # ---------------- Cookie Setup ----------------
 cookies = EncryptedCookieManager(
@@ -49,28 +57,12 @@ async def create_new_chat_in_db(username: str):
     default_name = "New Conversation" 
     st.session_state.setdefault('thread_names', {})[str(thread_id)] = default_name
 
-    # Store the new, empty conversation in the database
-    await store_conversation(thread_id, username, [], default_name)
+    # Register the new conversation in the database; its messages live in the checkpointer
+    await create_conversation(thread_id, username, default_name)
     # Clear any document info for the new thread in session state
     st.session_state['current_doc_info'] = None
 
 
-# Utility to convert LangChain messages to Streamlit format
-def format_messages(messages):
-    formatted = []
-    if messages:
-        for msg in messages:
-            if isinstance(msg, HumanMessage):
-                role = "user"
-            elif isinstance(msg, AIMessage):
-                role = "assistant"
-            elif isinstance(msg, ToolMessage): # Do not display ToolMessage in chat history
-                continue
-            else:
-                continue
-            formatted.append({"role": role, "content": msg.content})
-    return formatted
-
 # ---------------- Session Defaults ----------------
 if 'logged_in' not in st.session_state:
     st.session_state['logged_in'] = False
@@ -98,8 +90,7 @@ if cookies.get("username") and cookies.get("logged_in") == "True" and not st.ses
 
     if st.session_state['chat_threads']:
         st.session_state['thread_id'] = st.session_state['chat_threads'][-1]
-        messages = run_async(load_conversation_from_checkpointer(str(st.session_state['thread_id'])))
-        st.session_state['message_history'] = format_messages(messages)
+        st.session_state['message_history'] = run_async(load_conversation_from_checkpointer(str(st.session_state['thread_id'])))
         st.session_state['current_doc_info'] = run_async(get_document_for_thread(str(st.session_state['thread_id'])))
     else:
         run_async(create_new_chat_in_db(st.session_state['username']))
@@ -107,11 +98,15 @@ if cookies.get("username") and cookies.get("logged_in") == "True" and not st.ses
         threads, names = run_async(retrieve_all_threads_db(st.session_state['username']))
         st.session_state['chat_threads'], st.session_state['thread_names'] = threads, names
 
+    # Warm the user's other recent threads while the UI renders
+    submit_async_task(prefetch_recent_threads(st.session_state['username']))
     st.rerun()
 
 
 # ---------------- Logout ----------------
 def logout():
+    if st.session_state.get('username'):
+        submit_async_task(cancel_prefetch(st.session_state['username']))
     st.session_state.clear()
     cookies["username"] = ""
     cookies["logged_in"] = "False"
@@ -149,8 +144,7 @@ if not st.session_state.get('logged_in'):
 
                 if st.session_state['chat_threads']:
                     st.session_state['thread_id'] = st.session_state['chat_threads'][-1]
-                    messages = run_async(load_conversation_from_checkpointer(str(st.session_state['thread_id'])))
-                    st.session_state['message_history'] = format_messages(messages)
+                    st.session_state['message_history'] = run_async(load_conversation_from_checkpointer(str(st.session_state['thread_id'])))
                     st.session_state['current_doc_info'] = run_async(get_document_for_thread(str(st.session_state['thread_id'])))
                 else:
                     run_async(create_new_chat_in_db(username_login))
@@ -161,6 +155,7 @@ if not st.session_state.get('logged_in'):
                 cookies["logged_in"] = "True"
                 cookies["ai_counter"] = str(st.session_state['ai_counter'])
                 cookies.save()
+                submit_async_task(prefetch_recent_threads(username_login))
                 st.rerun()
             else:
                 st.error(res["error"])
@@ -238,8 +233,7 @@ for thread_id in filtered_threads[::-1]:
     with col1:
         if st.button(current_name, key=f"name_{thread_id}", use_container_width=True):
             st.session_state['thread_id'] = thread_id
-            messages = run_async(load_conversation_from_checkpointer(str(thread_id)))
-            st.session_state['message_history'] = format_messages(messages)
+            st.session_state['message_history'] = run_async(load_conversation_from_checkpointer(str(thread_id)))
             st.session_state['current_doc_info'] = run_async(get_document_for_thread(str(thread_id)))
             st.rerun()
             
@@ -305,6 +299,15 @@ for thread_id in filtered_threads[::-1]:
                 st.session_state[f"confirm_delete_{thread_id}"] = True
                 st.rerun()
 
+# ---------------- Stop ----------------
+def stop_generation():
+    thread_id = str(st.session_state['thread_id'])
+    report = stop_run(thread_id)
+    if report is not None:
+        st.session_state['stop_report'] = report
+        # The checkpoint now holds the partial answer; show what was kept
+        st.session_state['message_history'] = run_async(load_conversation_from_checkpointer(thread_id))
+
 # ---------------- Main Chat ----------------
 st.title("💬 LangGraph Chat")
 # Add a guard in case message_history is None
@@ -312,6 +315,14 @@ for message in st.session_state.get('message_history', []):
     with st.chat_message(message['role']):
         st.markdown(message['content'], unsafe_allow_html=True)
 
+stop_report = st.session_state.pop('stop_report', None)
+if stop_report is not None:
+    st.caption(
+        f"⏹ Stopped: {stop_report['tokens_streamed']} tokens kept, "
+        f"{stop_report['tool_calls_cancelled']} tool calls cancelled, "
+        f"{stop_report['model_calls_avoided']} model calls avoided."
+    )
+
 user_input = st.chat_input("Type your message...")
 if user_input:
     current_username = st.session_state.get("username")
@@ -332,41 +343,45 @@ if user_input:
         with st.chat_message('user'):
             st.markdown(user_input, unsafe_allow_html=True)
 
-        CONFIG = {"configurable":{"thread_id": str(st.session_state["thread_id"])}}
+        CONFIG = {"configurable":{"thread_id": str(st.session_state["thread_id"]), "username": current_username, "turn_id": str(uuid.uuid4())}}
         
         with st.chat_message('assistant'):
             status_holder = {"box": None}
             
+            run = start_run(CONFIG["configurable"]["thread_id"], CONFIG["configurable"]["turn_id"])
+            st.button("⏹ Stop", key=f"stop_{CONFIG['configurable']['turn_id']}", on_click=stop_generation)
+            heartbeat = st.empty()
+
             def ai_only_stream():
-                event_queue = queue.Queue()
-                async def run_stream():
-                    try:
-                        async for event in chatbot.astream_events(
-                            {'messages':[HumanMessage(content=user_input)]},
-                            config=CONFIG,
-                            version="v1"
-                        ):
-                            event_queue.put(event)
-                    except Exception as e:
-                        event_queue.put({"event": "error", "data": e})
-                    finally:
-                        event_queue.put(None)
-                
-                submit_async_task(run_stream())
-
-                while True:
-                    event = event_queue.get()
-                    if event is None: break
-                    if event['event'] == 'on_chat_model_stream':
-                        chunk = event['data']['chunk']
-                        if isinstance(chunk, AIMessageChunk) and chunk.content:
-                            yield chunk.content
-                    if event['event'] == 'on_tool_start':
-                        tool_name = event['name']
-                        if status_holder["box"] is None:
-                            status_holder["box"] = st.status(f"🔧 Using `{tool_name}` …")
+                async def run_stream(bridge):
+                    async for kind, payload in stream_turn(user_input, CONFIG, run):
+                        if kind == "token":
+                            await bridge.put_token(payload)
                         else:
-                            status_holder["box"].update(label=f"🔧 Using `{tool_name}` …")
+                            await bridge.put(kind, payload)
+
+                bridge = open_stream_bridge().start(run_stream)
+                attach_run(run, bridge)
+                try:
+                    # Waking up every second lets a Stop click interrupt a quiet run
+                    for frames in bridge.batches(poll_interval=1.0):
+                        if not frames:
+                            heartbeat.empty()
+                        for kind, payload in frames:
+                            if kind == "token":
+                                yield payload
+                            elif kind == "tool_start":
+                                if status_holder["box"] is None:
+                                    status_holder["box"] = st.status(f"🔧 Using `{payload}` …")
+                                else:
+                                    status_holder["box"].update(label=f"🔧 Using `{payload}` …")
+                            elif kind == "tool_end" and status_holder["box"] is not None:
+                                status_holder["box"].write(f"`{payload['name']}`: {payload['outcome'] or 'done'}")
+                            elif kind == "error":
+                                st.error(f"Something went wrong: {payload}")
+                finally:
+                    if STREAM_DEBUG:
+                        print(f"Stream stats: {bridge.stats()}")
 
             ai_message = st.write_stream(ai_only_stream())
             
@@ -375,11 +390,10 @@ if user_input:
 
         st.session_state['message_history'].append({'role':'assistant','content':ai_message})
         
-        run_async(store_conversation(
+        run_async(update_conversation_stats(
             str(st.session_state['thread_id']),
             current_username,
-            st.session_state['message_history'],
-            st.session_state['thread_names'][str(st.session_state['thread_id'])]
+            len(st.session_state['message_history'])
         ))
         
         st.rerun()
@@ -0,0 +1,119 @@
+import numpy as np
+
+# ---------------- Batch Calculations ----------------
+# Largest array accepted in one call.
+MAX_VALUES = 100_000
+# Elements returned inline for array results; the summary covers the rest.
+MAX_RETURNED_VALUES = 1000
+
+ELEMENTWISE = {
+    "add": np.add, "sub": np.subtract, "mul": np.multiply, "div": np.divide, "pow": np.power,
+}
+AGGREGATES = {
+    "sum": np.sum, "mean": np.mean, "median": np.median, "min": np.min, "max": np.max,
+    "std": np.std, "var": np.var, "prod": np.prod,
+}
+OPERATIONS = (
+    *ELEMENTWISE, *AGGREGATES, "count", "percentile", "describe",
+    "cumsum", "cumprod", "pct_change", "compound", "groupby",
+)
+
+
+def _array(values, name: str) -> np.ndarray:
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim != 1:
+        raise ValueError(f"{name} must be a flat list of numbers")
+    if array.size > MAX_VALUES:
+        raise ValueError(f"{name} has {array.size} values; at most {MAX_VALUES} are supported")
+    return array
+
+
+def _scalar(value) -> float | int | None:
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+    return int(value) if value.is_integer() and abs(value) < 1e15 else round(value, 10)
+
+
+def _result_array(array: np.ndarray) -> dict:
+    shown = [_scalar(v) for v in array[:MAX_RETURNED_VALUES]]
+    result = {"result": shown, "count": int(array.size), "sum": _scalar(np.nansum(array))}
+    if array.size > MAX_RETURNED_VALUES:
+        result["truncated"] = True
+    return result
+
+
+def batch_calculate(
+    values: list[float],
+    operation: str,
+    operand: float | None = None,
+    other: list[float] | None = None,
+    rate: float | None = None,
+    periods: int = 1,
+    percentiles: list[float] | None = None,
+    labels: list[str] | None = None,
+    aggregate: str = "sum",
+) -> dict:
+    """
+    Apply one vectorized operation to a whole array. Raises ValueError for
+    invalid input; callers turn that into an error payload.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unsupported operation '{operation}'. Use one of: {', '.join(OPERATIONS)}")
+    array = _array(values, "values")
+    if array.size == 0:
+        raise ValueError("values is empty")
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if operation in ELEMENTWISE:
+            if other is not None:
+                right = _array(other, "other")
+                if right.size != array.size:
+                    raise ValueError(f"values and other differ in length ({array.size} vs {right.size})")
+            elif operand is not None:
+                right = operand
+            else:
+                raise ValueError(f"'{operation}' needs an operand or an other array")
+            return _result_array(ELEMENTWISE[operation](array, right))
+
+        if operation in AGGREGATES:
+            return {"result": _scalar(AGGREGATES[operation](array)), "count": int(array.size)}
+        if operation == "count":
+            return {"result": int(array.size)}
+        if operation == "percentile":
+            q = percentiles or [25, 50, 75]
+            return {"result": {str(p): _scalar(v) for p, v in zip(q, np.percentile(array, q))}, "count": int(array.size)}
+        if operation == "describe":
+            p25, p50, p75 = np.percentile(array, [25, 50, 75])
+            return {"result": {
+                "count": int(array.size), "sum": _scalar(array.sum()), "mean": _scalar(array.mean()),
+                "std": _scalar(array.std()), "min": _scalar(array.min()), "p25": _scalar(p25),
+                "median": _scalar(p50), "p75": _scalar(p75), "max": _scalar(array.max()),
+            }}
+        if operation == "cumsum":
+            return _result_array(np.cumsum(array))
+        if operation == "cumprod":
+            return _result_array(np.cumprod(array))
+        if operation == "pct_change":
+            change = np.full(array.size, np.nan)
+            change[1:] = (array[1:] - array[:-1]) / array[:-1] * 100
+            return _result_array(change)
+        if operation == "compound":
+            if rate is None:
+                raise ValueError("'compound' needs a rate, e.g. 0.07 for 7%")
+            return _result_array(array * (1 + rate) ** periods)
+
+        # groupby
+        if labels is None or len(labels) != array.size:
+            raise ValueError("'groupby' needs one label per value")
+        if aggregate not in ("sum", "mean", "count", "min", "max"):
+            raise ValueError("aggregate must be sum, mean, count, min or max")
+        keys, inverse = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        counts = np.bincount(inverse, minlength=keys.size)
+        if aggregate in ("sum", "mean", "count"):
+            sums = np.bincount(inverse, weights=array, minlength=keys.size)
+            grouped = {"sum": sums, "mean": sums / counts, "count": counts}[aggregate]
+        else:
+            grouped = np.full(keys.size, np.inf if aggregate == "min" else -np.inf)
+            (np.minimum if aggregate == "min" else np.maximum).at(grouped, inverse, array)
+        return {"result": {key: _scalar(v) for key, v in zip(keys.tolist(), grouped)}, "aggregate": aggregate, "groups": int(keys.size)}
@@ -0,0 +1,80 @@
+"""
+Checkpoint growth benchmark: full vs delta-encoded message channel.
+
+Drives a one-node graph for 1000 turns against each checkpointer and, at
+turns 10, 100 and 1000, reports the bytes written for that turn and the
+latency of restoring the thread's latest state.
+
+    python bench_checkpoints.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+from typing import Annotated, TypedDict
+
+import aiosqlite
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from codec import CompressedSerializer
+from delta_checkpointer import DeltaSqliteSaver
+
+TURNS = 1000
+REPORT_AT = (10, 100, 1000)
+CONFIG = {"configurable": {"thread_id": "bench"}}
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+
+
+async def chat_node(state: ChatState):
+    turn = len(state["messages"]) // 2
+    return {"messages": [AIMessage(content=f"Answer {turn}: " + "lorem ipsum dolor sit amet " * 20)]}
+
+
+async def _stored_bytes(conn) -> int:
+    async with conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(checkpoint)), 0) + (SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes) FROM checkpoints"
+    ) as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def run(name: str, make_saver, path: str):
+    conn = await aiosqlite.connect(path)
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", chat_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    chatbot = graph.compile(checkpointer=make_saver(conn))
+
+    written = 0
+    for turn in range(1, TURNS + 1):
+        await chatbot.ainvoke({"messages": [HumanMessage(content=f"Question {turn}: " + "what about this? " * 10)]}, CONFIG)
+        if turn in REPORT_AT:
+            total = await _stored_bytes(conn)
+            turn_bytes = total - written
+            start = time.perf_counter()
+            await chatbot.checkpointer.aget_tuple(CONFIG)
+            restore_ms = (time.perf_counter() - start) * 1000
+            print(f"{name:>5} turn {turn:5}: {turn_bytes / 1024:9.1f} KiB written this turn | restore {restore_ms:7.2f} ms")
+        if turn + 1 in REPORT_AT:
+            written = await _stored_bytes(conn)
+    await conn.close()
+
+
+async def main():
+    variants = {
+        "full": lambda conn: AsyncSqliteSaver(conn, serde=CompressedSerializer()),
+        "delta": lambda conn: DeltaSqliteSaver(conn, serde=CompressedSerializer()),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make_saver in variants.items():
+            await run(name, make_saver, os.path.join(tmp, f"{name}.db"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Storage benchmark on a corpus exported from an existing chatbot.db.
+
+Re-writes every checkpoint, pending write and conversation row of the source
+database into two fresh databases -- one with the plain serializer, one with
+the compressed codec -- and reports file size and read/write throughput.
+
+    python bench_storage.py "../with mcp/chatbot.db"
+"""
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from codec import CompressedSerializer, decode_payload, encode_payload
+
+SCHEMA = """
+CREATE TABLE checkpoints (thread_id TEXT, checkpoint_id TEXT, type TEXT, checkpoint BLOB);
+CREATE TABLE writes (thread_id TEXT, checkpoint_id TEXT, idx INTEGER, type TEXT, value BLOB);
+CREATE TABLE conversations (thread_id TEXT, messages TEXT);
+"""
+
+
+def export_corpus(path: str) -> dict:
+    """Load and deserialize every payload from the source database."""
+    serde = CompressedSerializer(JsonPlusSerializer())
+    # Read-only, so the source database and its WAL are left untouched
+    src = sqlite3.connect(pathlib.Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    # conversations.messages only exists in databases from before the metadata-only schema
+    conversation_columns = {row[1] for row in src.execute("PRAGMA table_info(conversations)")}
+    corpus = {
+        "checkpoints": [
+            (tid, cid, serde.loads_typed((typ, blob)))
+            for tid, cid, typ, blob in src.execute("SELECT thread_id, checkpoint_id, type, checkpoint FROM checkpoints")
+        ],
+        "writes": [
+            (tid, cid, idx, serde.loads_typed((typ, blob)))
+            for tid, cid, idx, typ, blob in src.execute("SELECT thread_id, checkpoint_id, idx, type, value FROM writes")
+        ],
+        "conversations": [
+            (tid, decode_payload(messages))
+            for tid, messages in src.execute("SELECT thread_id, messages FROM conversations WHERE messages IS NOT NULL")
+        ] if "messages" in conversation_columns else [],
+    }
+    src.close()
+    return corpus
+
+
+def write_db(path: str, corpus: dict, serde, encode) -> float:
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    start = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO checkpoints VALUES (?, ?, ?, ?)",
+        ((tid, cid, *serde.dumps_typed(cp)) for tid, cid, cp in corpus["checkpoints"]),
+    )
+    conn.executemany(
+        "INSERT INTO writes VALUES (?, ?, ?, ?, ?)",
+        ((tid, cid, idx, *serde.dumps_typed(v)) for tid, cid, idx, v in corpus["writes"]),
+    )
+    conn.executemany(
+        "INSERT INTO conversations VALUES (?, ?)",
+        ((tid, encode(messages)) for tid, messages in corpus["conversations"]),
+    )
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.execute("VACUUM")
+    conn.close()
+    return elapsed
+
+
+def read_db(path: str, serde, decode) -> float:
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    for typ, blob in conn.execute("SELECT type, checkpoint FROM checkpoints"):
+        serde.loads_typed((typ, blob))
+    for typ, blob in conn.execute("SELECT type, value FROM writes"):
+        serde.loads_typed((typ, blob))
+    for (messages,) in conn.execute("SELECT messages FROM conversations"):
+        decode(messages)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main(source: str):
+    corpus = export_corpus(source)
+    rows = sum(len(v) for v in corpus.values())
+    variants = {
+        "plain": (JsonPlusSerializer(), json.dumps, decode_payload),
+        "codec": (CompressedSerializer(), encode_payload, decode_payload),
+    }
+    print(f"corpus: {source} ({rows} rows)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (serde, encode, decode) in variants.items():
+            path = os.path.join(tmp, f"{name}.db")
+            write_s = write_db(path, corpus, serde, encode)
+            read_s = read_db(path, serde, decode)
+            size_kb = os.path.getsize(path) / 1024
+            print(
+                f"{name:>6}: {size_kb:8.1f} KiB | "
+                f"write {rows / write_s:8.0f} rows/s | read {rows / read_s:8.0f} rows/s"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.path.join("..", "with mcp", "chatbot.db"))
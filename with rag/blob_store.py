@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+
+# ---------------- Blob Store ----------------
+BLOB_DIR = "tool_blobs"
+# Tool outputs longer than this are stored once on disk and referenced from the message.
+EXTERNALIZE_THRESHOLD = 2000
+# Characters of the output kept inline so older turns still carry a hint of the result.
+PREVIEW_CHARS = 300
+BLOB_REF_KEY = "blob_ref"
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def _write_blob(text: str) -> str:
+    data = text.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file first so readers never see a partial blob
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as temp_file:
+        temp_file.write(data)
+    os.replace(temp_file.name, path)
+    return digest
+
+
+def _read_blob(digest: str) -> str | None:
+    try:
+        with open(_blob_path(digest), "rb") as f:
+            return f.read().decode("utf-8")
+    except OSError:
+        return None
+
+
+async def externalize(message: BaseMessage) -> BaseMessage:
+    """Move a large ToolMessage payload to the blob store, keeping a reference and a preview."""
+    if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+        return message
+    if len(message.content) <= EXTERNALIZE_THRESHOLD or BLOB_REF_KEY in message.additional_kwargs:
+        return message
+    digest = await asyncio.to_thread(_write_blob, message.content)
+    preview = message.content[:PREVIEW_CHARS]
+    return message.model_copy(update={
+        "content": f"{preview}… [full output of {len(message.content)} chars stored as blob {digest[:12]}]",
+        "additional_kwargs": {**message.additional_kwargs, BLOB_REF_KEY: digest},
+    })
+
+
+async def rehydrate(message: BaseMessage) -> BaseMessage:
+    """Restore the full payload of an externalized ToolMessage. Keeps the preview if the blob is gone."""
+    digest = message.additional_kwargs.get(BLOB_REF_KEY) if isinstance(message, ToolMessage) else None
+    if not digest:
+        return message
+    content = await asyncio.to_thread(_read_blob, digest)
+    if content is None:
+        return message
+    return message.model_copy(update={"content": content})
+
+
+async def rehydrate_current_turn(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """
+    Rehydrate only the tool results of the turn in progress (after the last
+    HumanMessage); older turns keep their short previews.
+    """
+    start = 0
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            start = index
+            break
+    current = await asyncio.gather(*(rehydrate(m) for m in messages[start:]))
+    return [*messages[:start], *current]
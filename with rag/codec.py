@@ -0,0 +1,88 @@
+import json
+from typing import Any
+
+import ormsgpack
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# ---------------- Payload Format ----------------
+# Every encoded payload starts with one header byte so the reader can tell the
+# formats apart. Legacy rows were written as plain json.dumps text and have no
+# header; they are still decoded as JSON.
+HEADER_MSGPACK = b"\x01"       # msgpack, stored as-is
+HEADER_MSGPACK_ZSTD = b"\x02"  # msgpack, zstd-compressed
+
+# Payloads smaller than this are not worth the compression frame overhead.
+COMPRESS_THRESHOLD = 256
+ZSTD_LEVEL = 3
+
+# The backend runs every DB call on a single event loop thread, so one
+# compressor/decompressor pair can be shared.
+_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def encode_payload(obj: Any) -> bytes:
+    """Encode a JSON-compatible object for storage in a TEXT/BLOB column."""
+    packed = ormsgpack.packb(obj)
+    if len(packed) < COMPRESS_THRESHOLD:
+        return HEADER_MSGPACK + packed
+    return HEADER_MSGPACK_ZSTD + _compressor.compress(packed)
+
+
+def decode_payload(raw) -> Any:
+    """
+    Decode a value written by encode_payload, or a legacy json.dumps row.
+    Raises ValueError if the payload cannot be decoded.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return json.loads(raw)
+
+    raw = bytes(raw)
+    header, body = raw[:1], raw[1:]
+    try:
+        if header == HEADER_MSGPACK:
+            return ormsgpack.unpackb(body)
+        if header == HEADER_MSGPACK_ZSTD:
+            return ormsgpack.unpackb(_decompressor.decompress(body))
+    except (zstandard.ZstdError, ormsgpack.MsgpackDecodeError) as e:
+        raise ValueError(f"Corrupted payload: {e}") from e
+    # Legacy JSON that ended up stored as a BLOB
+    return json.loads(raw.decode("utf-8"))
+
+
+# ---------------- Checkpointer Serializer ----------------
+class CompressedSerializer(SerializerProtocol):
+    """
+    Wraps the LangGraph serializer and zstd-compresses large checkpoint and
+    write blobs. Compressed blobs are tagged by a '+zstd' suffix on the type
+    column, so existing uncompressed checkpoints keep loading unchanged.
+    """
+
+    SUFFIX = "+zstd"
+
+    def __init__(self, serde: SerializerProtocol | None = None, threshold: int = COMPRESS_THRESHOLD) -> None:
+        self.serde = serde or JsonPlusSerializer()
+        self.threshold = threshold
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(obj)
+        if len(data) < self.threshold:
+            return typ, data
+        return f"{typ}{self.SUFFIX}", _compressor.compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        typ, payload = data
+        if typ and typ.endswith(self.SUFFIX):
+            typ = typ[: -len(self.SUFFIX)]
+            payload = _decompressor.decompress(payload)
+        return self.serde.loads_typed((typ, payload))
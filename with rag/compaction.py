@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import os
+
+import aiosqlite
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+# ---------------- Retention Policy ----------------
+# Keep the latest checkpoint plus this many historical ones per thread.
+KEEP_HISTORY = 5
+# How often the background compaction runs (seconds).
+COMPACTION_INTERVAL = 15 * 60
+# Free pages released per incremental_vacuum step, so the connection is never
+# held for long while users are chatting.
+VACUUM_PAGES_PER_STEP = 256
+
+
+async def _db_size(conn) -> int:
+    """Main database file plus WAL, in bytes."""
+    async with conn.execute("PRAGMA database_list") as cursor:
+        rows = await cursor.fetchall()
+    path = next((row[2] for row in rows if row[1] == "main"), None)
+    if not path:
+        return 0
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+async def _incremental_vacuum_enabled(conn) -> bool:
+    async with conn.execute("PRAGMA auto_vacuum") as cursor:
+        return (await cursor.fetchone())[0] == 2  # 2 == INCREMENTAL
+
+
+async def enable_incremental_vacuum(conn) -> bool:
+    """
+    Switch the database to incremental auto_vacuum. On a database that already
+    has tables this needs a full VACUUM, which rewrites the whole file, so it
+    is run from the command line against a stopped app, never by the backend.
+    Returns False if the mode was already set.
+    """
+    if await _incremental_vacuum_enabled(conn):
+        return False
+    await conn.commit()
+    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    await conn.execute("VACUUM")
+    return True
+
+
+async def prune_checkpoints(conn, keep: int = KEEP_HISTORY) -> tuple[int, int]:
+    """
+    Delete all but the latest `keep + 1` checkpoints of every thread, and the
+    pending writes that belonged to them. Returns (checkpoints, writes) deleted.
+    """
+    cursor = await conn.execute('''
+        DELETE FROM checkpoints WHERE rowid IN (
+            SELECT rowid FROM (
+                SELECT rowid, ROW_NUMBER() OVER (
+                    PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                ) AS rn
+                FROM checkpoints
+            ) WHERE rn > ?
+        )
+    ''', (keep + 1,))
+    checkpoints_deleted = cursor.rowcount
+    cursor = await conn.execute('''
+        DELETE FROM writes WHERE NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = writes.thread_id
+              AND c.checkpoint_ns = writes.checkpoint_ns
+              AND c.checkpoint_id = writes.checkpoint_id
+        )
+    ''')
+    return checkpoints_deleted, cursor.rowcount
+
+
+async def purge_deleted_threads(conn, thread_id: str | None = None) -> tuple[int, int]:
+    """
+    Delete checkpoints and writes of threads recorded in `deleted_threads`
+    by database.delete_conversation, then their tombstones. Threads that
+    merely have no `conversations` row are left alone. Restrict to one
+    thread by passing thread_id. Returns (checkpoints, writes) deleted.
+    """
+    where, params = "SELECT thread_id FROM deleted_threads", ()
+    if thread_id is not None:
+        where += " WHERE thread_id=?"
+        params = (str(thread_id),)
+    deleted = []
+    for table in ("checkpoints", "writes"):
+        cursor = await conn.execute(f"DELETE FROM {table} WHERE thread_id IN ({where})", params)
+        deleted.append(cursor.rowcount)
+    await conn.execute(f"DELETE FROM deleted_threads WHERE thread_id IN ({where})", params)
+    await conn.commit()
+    return deleted[0], deleted[1]
+
+
+async def compact(checkpointer: AsyncSqliteSaver, keep: int = KEEP_HISTORY) -> dict:
+    """
+    Apply the retention policy, then release the freed pages and truncate the WAL.
+    Holds the checkpointer lock so no graph step writes in between. Pages are
+    only released on databases switched to incremental auto_vacuum (see
+    enable_incremental_vacuum); elsewhere SQLite reuses them for new rows.
+    """
+    conn = checkpointer.conn
+    await checkpointer.setup()
+    async with checkpointer.lock:
+        size_before = await _db_size(conn)
+        # Delta-encoded checkpoints must not lose their base to pruning
+        saver = getattr(checkpointer, "saver", checkpointer)
+        if hasattr(saver, "materialize_before_prune"):
+            await saver.materialize_before_prune(keep)
+        pruned_checkpoints, pruned_writes = await prune_checkpoints(conn, keep)
+        purged_checkpoints, purged_writes = await purge_deleted_threads(conn)
+        incremental = await _incremental_vacuum_enabled(conn)
+
+    # Release free pages in small steps, yielding the lock in between
+    last_free_pages = None
+    while incremental:
+        async with checkpointer.lock:
+            async with conn.execute("PRAGMA freelist_count") as cursor:
+                free_pages = (await cursor.fetchone())[0]
+            if not free_pages or free_pages == last_free_pages:
+                break
+            last_free_pages = free_pages
+            await conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})")
+            await conn.commit()
+        await asyncio.sleep(0)
+
+    async with checkpointer.lock:
+        await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_after = await _db_size(conn)
+
+    return {
+        "checkpoints_deleted": pruned_checkpoints + purged_checkpoints,
+        "writes_deleted": pruned_writes + purged_writes,
+        "bytes_reclaimed": max(size_before - size_after, 0),
+    }
+
+
+async def run_compaction_forever(checkpointer: AsyncSqliteSaver, interval: float = COMPACTION_INTERVAL):
+    """Background task: compact the checkpoint store every `interval` seconds."""
+    while True:
+        try:
+            report = await compact(checkpointer)
+            print(
+                f"Checkpoint compaction: removed {report['checkpoints_deleted']} checkpoints, "
+                f"{report['writes_deleted']} writes, reclaimed {report['bytes_reclaimed']} bytes."
+            )
+        except Exception as e:
+            print(f"Checkpoint compaction failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def main(args):
+    conn = await aiosqlite.connect(args.db)
+    try:
+        if await enable_incremental_vacuum(conn):
+            print(f"{args.db}: switched to incremental auto_vacuum")
+        else:
+            print(f"{args.db}: incremental auto_vacuum already enabled")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Switch the chatbot database to incremental auto_vacuum (full VACUUM; stop the app first)."
+    )
+    parser.add_argument("--db", default="chatbot.db")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+from functools import lru_cache
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# ---------------- Windowing Settings ----------------
+# Token budget for the history sent to the LLM on each call.
+HISTORY_TOKEN_BUDGET = 6000
+# The most recent turns are always sent in full, whatever their size.
+RECENT_TURNS = 2
+# Older tool outputs are cut down to a short preview of this many characters.
+ELIDED_TOOL_CHARS = 200
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """Load the tokenizer once per process. Falls back to a char estimate if unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Tokenizer unavailable, estimating token counts: {e}")
+        return None
+
+
+@lru_cache(maxsize=8192)
+def count_text(text: str) -> int:
+    """Approximate tokens in a piece of text."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(message: BaseMessage) -> int:
+    """Approximate prompt tokens for one message (content plus tool call arguments)."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    tokens = count_text(content) + 4  # per-message overhead
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += count_text(f"{call.get('name')}{call.get('args')}")
+    return tokens
+
+
+def _elide(message: BaseMessage) -> BaseMessage:
+    """Replace an old tool output with a short preview, keeping the tool_call_id pairing."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if len(content) <= ELIDED_TOOL_CHARS:
+        return message
+    preview = content[:ELIDED_TOOL_CHARS]
+    return message.model_copy(update={"content": f"{preview}… [older tool output elided]"})
+
+
+def window_messages(
+    messages: list[BaseMessage],
+    max_tokens: int = HISTORY_TOKEN_BUDGET,
+    recent_turns: int = RECENT_TURNS,
+) -> list[BaseMessage]:
+    """
+    Trim the history to fit max_tokens before it is sent to the LLM.
+
+    Leading system messages and the last `recent_turns` turns are always kept.
+    Older turns (a HumanMessage and everything up to the next one) have their
+    tool outputs elided and are then dropped oldest-first, whole, so an AI
+    tool call is never separated from its ToolMessage results.
+    History is walked from the end and the walk stops once the budget is
+    spent, so the cost depends on the window size, not the thread length.
+    """
+    head = []
+    for message in messages:
+        if not isinstance(message, SystemMessage):
+            break
+        head.append(message)
+    budget = max_tokens - sum(count_tokens(m) for m in head)
+
+    kept_turns = []
+    turn = []
+    for message in reversed(messages[len(head):]):
+        turn.append(message)
+        if not isinstance(message, HumanMessage):
+            continue
+        turn.reverse()
+        if len(kept_turns) >= recent_turns:
+            turn = [_elide(m) if isinstance(m, ToolMessage) else m for m in turn]
+        cost = sum(count_tokens(m) for m in turn)
+        if len(kept_turns) >= recent_turns and cost > budget:
+            break
+        kept_turns.append(turn)
+        budget -= cost
+        turn = []
+    else:
+        # Messages before the first HumanMessage (e.g. a thread seeded by the AI)
+        if turn and len(kept_turns) < recent_turns:
+            turn.reverse()
+            kept_turns.append(turn)
+
+    windowed = list(head)
+    for turn in reversed(kept_turns):
+        windowed.extend(turn)
+    return windowed
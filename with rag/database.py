@@ -1,5 +1,6 @@
 import aiosqlite
-import json
+
+from codec import encode_payload, decode_payload
 
 async def init_db(conn: aiosqlite.Connection):
     await conn.execute('''
@@ -16,9 +17,12 @@ async def init_db(conn: aiosqlite.Connection):
         thread_id TEXT PRIMARY KEY,
         username TEXT NOT NULL,
         conversation_name TEXT NOT NULL,
-        messages TEXT
+        created_at TEXT,
+        updated_at TEXT,
+        message_count INTEGER DEFAULT 0
     )
     ''')
+    await _migrate_conversations(conn)
     
     await conn.execute('''
     CREATE TABLE IF NOT EXISTS documents (
@@ -29,9 +33,70 @@ async def init_db(conn: aiosqlite.Connection):
         FOREIGN KEY (thread_id) REFERENCES conversations (thread_id)
     )
     ''')
-    
+
+    # Threads whose conversation was deleted; compaction purges their checkpoints
+    await conn.execute('''
+    CREATE TABLE IF NOT EXISTS deleted_threads (
+        thread_id TEXT PRIMARY KEY,
+        deleted_at TEXT
+    )
+    ''')
+
+    # One row per model call or tool call, written in batches by turn_metrics.MetricsWriter
+    await conn.execute('''
+    CREATE TABLE IF NOT EXISTS turn_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        turn_id TEXT,
+        thread_id TEXT,
+        username TEXT,
+        node TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        wall_ms REAL,
+        ttft_ms REAL,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        cached_tokens INTEGER,
+        cost_usd REAL,
+        tool_name TEXT,
+        tool_latency_ms REAL,
+        retrieved_chunks INTEGER,
+        retrieved_chars INTEGER,
+        outcome TEXT
+    )
+    ''')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_turn_metrics_user_time ON turn_metrics (username, created_at)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_turn_metrics_thread ON turn_metrics (thread_id)')
+
     await conn.commit()
 
+async def _migrate_conversations(conn: aiosqlite.Connection):
+    """
+    Older databases kept a full JSON copy of every chat in conversations.messages.
+    History now lives only in the checkpointer, so the table keeps metadata only.
+    """
+    async with conn.execute("PRAGMA table_info(conversations)") as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    for column, column_type in (("created_at", "TEXT"), ("updated_at", "TEXT"), ("message_count", "INTEGER DEFAULT 0")):
+        if column not in columns:
+            await conn.execute(f"ALTER TABLE conversations ADD COLUMN {column} {column_type}")
+    if "messages" not in columns:
+        return
+
+    # Backfill the message count before the copy is dropped
+    async with conn.execute("SELECT thread_id, messages FROM conversations WHERE messages IS NOT NULL") as cursor:
+        rows = await cursor.fetchall()
+    for thread_id, messages in rows:
+        try:
+            count = len(decode_payload(messages))
+        except ValueError:
+            continue
+        await conn.execute("UPDATE conversations SET message_count=? WHERE thread_id=?", (count, thread_id))
+    try:
+        await conn.execute("ALTER TABLE conversations DROP COLUMN messages")
+    except aiosqlite.OperationalError:
+        # SQLite older than 3.35 cannot drop columns; just release the data
+        await conn.execute("UPDATE conversations SET messages=NULL")
+
 async def increment_ai_count(conn: aiosqlite.Connection, username: str) -> int:
     async with conn.execute("SELECT ai_count FROM users WHERE username=?", (username,)) as cursor:
         row = await cursor.fetchone()
@@ -43,18 +108,21 @@ async def increment_ai_count(conn: aiosqlite.Connection, username: str) -> int:
         return ai_count
     return 0
 
-async def store_conversation(conn: aiosqlite.Connection, thread_id, username, messages, conversation_name):
-    messages_json = json.dumps(messages)
+async def create_conversation(conn: aiosqlite.Connection, thread_id, username, conversation_name):
     await conn.execute('''
-        INSERT OR REPLACE INTO conversations (thread_id, username, conversation_name, messages)
-        VALUES (?, ?, ?, ?)
-    ''', (str(thread_id), username, conversation_name, messages_json))
+        INSERT OR IGNORE INTO conversations (thread_id, username, conversation_name, created_at, updated_at, message_count)
+        VALUES (?, ?, ?, datetime('now'), datetime('now'), 0)
+    ''', (str(thread_id), username, conversation_name))
+    await conn.execute("DELETE FROM deleted_threads WHERE thread_id=?", (str(thread_id),))
     await conn.commit()
 
-async def load_conversation(conn: aiosqlite.Connection, thread_id, username):
-    async with conn.execute("SELECT messages FROM conversations WHERE thread_id=? AND username=?", (thread_id, username)) as cursor:
-        row = await cursor.fetchone()
-    return json.loads(row[0]) if row and row[0] else []
+async def update_conversation_stats(conn: aiosqlite.Connection, thread_id, username, message_count):
+    """Records a finished turn. The messages themselves are stored by the checkpointer."""
+    await conn.execute(
+        "UPDATE conversations SET updated_at=datetime('now'), message_count=? WHERE thread_id=? AND username=?",
+        (message_count, str(thread_id), username),
+    )
+    await conn.commit()
 
 async def retrieve_all_threads(conn: aiosqlite.Connection, username):
     async with conn.execute("SELECT thread_id, conversation_name FROM conversations WHERE username=? ORDER BY rowid", (username,)) as cursor:
@@ -64,28 +132,42 @@ async def retrieve_all_threads(conn: aiosqlite.Connection, username):
     thread_names = {row[0]: row[1] for row in rows}
     return chat_threads, thread_names
 
+async def recent_threads(conn: aiosqlite.Connection, username, limit):
+    """Thread ids of the user's most recently active conversations, newest first."""
+    async with conn.execute(
+        "SELECT thread_id FROM conversations WHERE username=? ORDER BY COALESCE(updated_at, created_at, '') DESC, rowid DESC LIMIT ?",
+        (username, limit),
+    ) as cursor:
+        rows = await cursor.fetchall()
+    return [row[0] for row in rows]
+
 async def store_conversation_name(conn: aiosqlite.Connection, thread_id, username, new_name):
     await conn.execute("UPDATE conversations SET conversation_name=? WHERE thread_id=? AND username=?",
                    (new_name, str(thread_id), username))
     await conn.commit()
 
 async def delete_conversation(conn: aiosqlite.Connection, thread_id, username):
-    await conn.execute("DELETE FROM conversations WHERE thread_id=? AND username=?", (str(thread_id), username))
+    cursor = await conn.execute("DELETE FROM conversations WHERE thread_id=? AND username=?", (str(thread_id), username))
+    if cursor.rowcount:
+        # Tombstone, so only checkpoints of deleted conversations are ever purged
+        await conn.execute(
+            "INSERT OR REPLACE INTO deleted_threads (thread_id, deleted_at) VALUES (?, datetime('now'))", (str(thread_id),)
+        )
     await delete_document(conn, thread_id) # Also delete associated document
     await conn.commit()
     
 # ----------------- Document Functions -----------------
 async def add_document(conn: aiosqlite.Connection, thread_id: str, filename: str, vectorstore_path: str, doc_info: dict):
-    doc_info_json = json.dumps(doc_info)
+    doc_info_blob = encode_payload(doc_info)
     await conn.execute('''
         INSERT OR REPLACE INTO documents (thread_id, filename, vectorstore_path, doc_info)
         VALUES (?, ?, ?, ?)
-    ''', (thread_id, filename, vectorstore_path, doc_info_json))
+    ''', (thread_id, filename, vectorstore_path, doc_info_blob))
     await conn.commit()
 
 async def get_document_for_thread(conn: aiosqlite.Connection, thread_id: str):
     """
-    Retrieves document info for a given thread_id, safely parsing JSON.
+    Retrieves document info for a given thread_id, safely decoding the stored payload.
     """
     async with conn.execute("SELECT filename, doc_info FROM documents WHERE thread_id=?", (thread_id,)) as cursor:
         row = await cursor.fetchone()
@@ -94,10 +176,10 @@ async def get_document_for_thread(conn: aiosqlite.Connection, thread_id: str):
         doc_info_data = {}  # Default to an empty dict
         if doc_info_str:  # Check if the string is not None or empty
             try:
-                doc_info_data = json.loads(doc_info_str)
-            except json.JSONDecodeError:
+                doc_info_data = decode_payload(doc_info_str)
+            except ValueError:
                 # This can happen if the data is corrupted or not valid JSON
-                print(f"Warning: Could not decode doc_info JSON for thread {thread_id}")
+                print(f"Warning: Could not decode doc_info for thread {thread_id}")
                 pass  # Keep doc_info_data as {}
         return {"filename": filename, "doc_info": doc_info_data}
     return None
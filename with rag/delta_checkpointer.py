@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+MESSAGES_CHANNEL = "messages"
+DELTA_KEY = "__messages_delta__"
+# Every Nth checkpoint of a thread stores the full message list, which bounds
+# the number of deltas replayed to restore any checkpoint.
+SNAPSHOT_EVERY = 20
+# Threads whose last written message list is remembered for diffing.
+MAX_TRACKED_THREADS = 1024
+
+
+def _diff(parent: list[BaseMessage], messages: list[BaseMessage]) -> dict | None:
+    """
+    Describe `messages` as removed / replaced / appended messages against
+    `parent`, mirroring what add_messages can do. Returns None if the new
+    list cannot be rebuilt that way (then a full snapshot is written).
+    """
+    parent_by_id = {m.id: m for m in parent}
+    if None in parent_by_id or len(parent_by_id) != len(parent):
+        return None
+    new_ids = {m.id for m in messages}
+    delta = {
+        "removed": [mid for mid in parent_by_id if mid not in new_ids],
+        "replaced": [
+            m for m in messages
+            if m.id in parent_by_id and parent_by_id[m.id] is not m and parent_by_id[m.id] != m
+        ],
+        "appended": [m for m in messages if m.id not in parent_by_id],
+    }
+    rebuilt = _apply(parent, delta)
+    if [m.id for m in rebuilt] != [m.id for m in messages]:
+        return None
+    return delta
+
+
+def _apply(parent: list[BaseMessage], delta: dict) -> list[BaseMessage]:
+    removed = set(delta["removed"])
+    replaced = {m.id: m for m in delta["replaced"]}
+    return [replaced.get(m.id, m) for m in parent if m.id not in removed] + list(delta["appended"])
+
+
+class DeltaSqliteSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver that stores the `messages` channel of a checkpoint as a
+    delta against its parent checkpoint instead of the whole accumulated list.
+
+    A delta is written when the parent is the last checkpoint this process
+    wrote for the thread; otherwise, and every SNAPSHOT_EVERY checkpoints, the
+    full list is stored. Reads replay at most SNAPSHOT_EVERY deltas on top of
+    the nearest full snapshot.
+    """
+
+    def __init__(self, conn, *, serde=None, snapshot_every: int = SNAPSHOT_EVERY):
+        super().__init__(conn, serde=serde)
+        self.snapshot_every = snapshot_every
+        # (thread_id, checkpoint_ns) -> (checkpoint_id, messages, depth since last snapshot)
+        self._last_written: OrderedDict[tuple[str, str], tuple[str, list, int]] = OrderedDict()
+
+    # ---------------- Write path ----------------
+    def _key(self, config: RunnableConfig) -> tuple[str, str]:
+        return (str(config["configurable"]["thread_id"]), config["configurable"].get("checkpoint_ns", ""))
+
+    def _encode(self, config: RunnableConfig, checkpoint: Checkpoint) -> tuple[Checkpoint, int]:
+        """Return the checkpoint to store and its depth since the last full snapshot."""
+        messages = checkpoint["channel_values"].get(MESSAGES_CHANNEL)
+        if not isinstance(messages, list):
+            return checkpoint, 0
+        parent_id = config["configurable"].get("checkpoint_id")
+        last = self._last_written.get(self._key(config))
+
+        stored, depth = messages, 0
+        if last and last[0] == parent_id and last[2] + 1 < self.snapshot_every:
+            delta = _diff(last[1], messages)
+            if delta is not None:
+                depth = last[2] + 1
+                stored = {DELTA_KEY: {"base": parent_id, **delta}}
+        return {**checkpoint, "channel_values": {**checkpoint["channel_values"], MESSAGES_CHANNEL: stored}}, depth
+
+    def _written(self, config: RunnableConfig, checkpoint: Checkpoint, depth: int):
+        """Remember a committed checkpoint as the base for the thread's next delta."""
+        messages = checkpoint["channel_values"].get(MESSAGES_CHANNEL)
+        if not isinstance(messages, list):
+            return
+        key = self._key(config)
+        self._last_written[key] = (checkpoint["id"], messages, depth)
+        self._last_written.move_to_end(key)
+        while len(self._last_written) > MAX_TRACKED_THREADS:
+            self._last_written.popitem(last=False)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        stored, depth = self._encode(config, checkpoint)
+        try:
+            next_config = await super().aput(config, stored, metadata, new_versions)
+        except Exception:
+            # The base may not be on disk; the thread's next write is a full snapshot
+            self._last_written.pop(self._key(config), None)
+            raise
+        self._written(config, checkpoint, depth)
+        return next_config
+
+    # ---------------- Read path ----------------
+    async def _load_messages(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list[BaseMessage]:
+        """Rebuild the message list of a stored checkpoint. The caller must hold self.lock."""
+        deltas = []
+        while True:
+            async with self.conn.execute(
+                "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Missing base checkpoint {checkpoint_id} for thread {thread_id}")
+            stored = self.serde.loads_typed(row).get("channel_values", {}).get(MESSAGES_CHANNEL, [])
+            if not isinstance(stored, dict) or DELTA_KEY not in stored:
+                messages = stored
+                break
+            deltas.append(stored[DELTA_KEY])
+            checkpoint_id = stored[DELTA_KEY]["base"]
+        for delta in reversed(deltas):
+            messages = _apply(messages, delta)
+        return messages
+
+    async def _resolve(self, checkpoint_tuple: CheckpointTuple | None) -> CheckpointTuple | None:
+        """Replace a stored delta with the full message list. The caller must hold self.lock."""
+        if checkpoint_tuple is None:
+            return None
+        stored = checkpoint_tuple.checkpoint["channel_values"].get(MESSAGES_CHANNEL)
+        if not isinstance(stored, dict) or DELTA_KEY not in stored:
+            return checkpoint_tuple
+        configurable = checkpoint_tuple.config["configurable"]
+        base = await self._load_messages(configurable["thread_id"], configurable["checkpoint_ns"], stored[DELTA_KEY]["base"])
+        checkpoint = checkpoint_tuple.checkpoint
+        checkpoint["channel_values"] = {**checkpoint["channel_values"], MESSAGES_CHANNEL: _apply(base, stored[DELTA_KEY])}
+        return checkpoint_tuple
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        checkpoint_tuple = await super().aget_tuple(config)
+        async with self.lock:
+            return await self._resolve(checkpoint_tuple)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        # The parent implementation holds self.lock while it yields
+        async for checkpoint_tuple in super().alist(config, filter=filter, before=before, limit=limit):
+            yield await self._resolve(checkpoint_tuple)
+
+    # ---------------- Compaction support ----------------
+    async def materialize_before_prune(self, keep: int) -> int:
+        """
+        Rewrite as full snapshots the checkpoints that the retention policy keeps
+        but whose parent it prunes, so pruning cannot break a delta chain.
+        Deltas are always taken against the parent, so only those rows need
+        to be read. The caller must hold self.lock. Returns the rows rewritten.
+        """
+        async with self.conn.execute('''
+            WITH ranked AS (
+                SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, ROW_NUMBER() OVER (
+                    PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                ) AS rn
+                FROM checkpoints
+            )
+            SELECT c.thread_id, c.checkpoint_ns, c.checkpoint_id FROM ranked c
+            WHERE c.rn <= ? AND c.parent_checkpoint_id IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM ranked p
+                WHERE p.thread_id = c.thread_id AND p.checkpoint_ns = c.checkpoint_ns
+                  AND p.checkpoint_id = c.parent_checkpoint_id AND p.rn <= ?
+            )
+        ''', (keep + 1, keep + 1)) as cursor:
+            candidates = await cursor.fetchall()
+
+        rewritten = 0
+        for thread_id, checkpoint_ns, checkpoint_id in candidates:
+            async with self.conn.execute(
+                "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ) as cursor:
+                row = await cursor.fetchone()
+            checkpoint = self.serde.loads_typed(row)
+            stored = checkpoint["channel_values"].get(MESSAGES_CHANNEL)
+            if not isinstance(stored, dict) or DELTA_KEY not in stored:
+                continue
+            checkpoint["channel_values"][MESSAGES_CHANNEL] = await self._load_messages(thread_id, checkpoint_ns, checkpoint_id)
+            await self.conn.execute(
+                "UPDATE checkpoints SET type = ?, checkpoint = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (*self.serde.dumps_typed(checkpoint), thread_id, checkpoint_ns, checkpoint_id),
+            )
+            rewritten += 1
+        return rewritten
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+# Upper bound on the total size of cached message contents.
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+
+# Utility to convert LangChain messages to Streamlit format
+def format_messages(messages):
+    formatted = []
+    if messages:
+        for msg in messages:
+            if isinstance(msg, HumanMessage):
+                role = "user"
+            elif isinstance(msg, AIMessage):
+                role = "assistant"
+            elif isinstance(msg, ToolMessage): # Do not display ToolMessage in chat history
+                continue
+            else:
+                continue
+            formatted.append({"role": role, "content": msg.content})
+    return formatted
+
+
+def _history_size(history: list[dict]) -> int:
+    """UTF-8 size of the cached message contents."""
+    return sum(len(str(message["content"]).encode("utf-8")) for message in history)
+
+
+class HistoryCache:
+    """
+    Per-process LRU of formatted thread histories, keyed by thread_id and
+    the checkpoint_id they were read from. There is at most one entry per
+    thread: a lookup with a newer checkpoint_id misses and drops the stale
+    entry. Total size is bounded by the bytes of cached message contents.
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: OrderedDict[str, tuple[str, list[dict], int]] = OrderedDict()
+
+    def get(self, thread_id: str, checkpoint_id: str):
+        entry = self._entries.get(thread_id)
+        if entry is None:
+            return None
+        if entry[0] != checkpoint_id:
+            self.invalidate(thread_id)
+            return None
+        self._entries.move_to_end(thread_id)
+        # Callers append to the list they get back, so hand out a copy
+        return list(entry[1])
+
+    def put(self, thread_id: str, checkpoint_id: str, history: list[dict]):
+        self.invalidate(thread_id)
+        size = _history_size(history)
+        if size > self.max_bytes:
+            return
+        self._entries[thread_id] = (checkpoint_id, list(history), size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def invalidate(self, thread_id: str):
+        entry = self._entries.pop(thread_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
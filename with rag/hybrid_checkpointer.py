@@ -0,0 +1,257 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+# Upper bound on the approximate size of the checkpoints kept in memory.
+# Colder threads are evicted and reloaded from SQLite on demand.
+MAX_HOT_BYTES = 64 * 1024 * 1024
+
+
+def _approx_size(checkpoint: Checkpoint) -> int:
+    """Rough size of a checkpoint: message contents plus the text of other channel values."""
+    size = 0
+    for value in checkpoint["channel_values"].values():
+        if isinstance(value, list):
+            size += sum(len(str(getattr(item, "content", item))) for item in value)
+        else:
+            size += len(str(value))
+    return size
+
+
+def _snapshot(checkpoint: Checkpoint) -> Checkpoint:
+    """Copy of a checkpoint down to its list values, so later changes by the caller cannot reach the write."""
+    snapshot = copy_checkpoint(checkpoint)
+    snapshot["channel_values"] = {
+        channel: list(value) if isinstance(value, list) else value
+        for channel, value in snapshot["channel_values"].items()
+    }
+    return snapshot
+
+
+class HybridCheckpointer(BaseCheckpointSaver):
+    """
+    Serves the latest checkpoint of hot threads from an in-memory LRU and
+    writes every checkpoint through to an AsyncSqliteSaver in the background.
+
+    Graph steps only wait for the in-memory update. Background writes are
+    applied in order by a single writer task; `aflush(thread_id)` waits until
+    everything queued for a thread is on disk, and is awaited at the end of
+    each turn so completed turns are as durable as before. A failed write
+    evicts the thread from memory, so reads fall back to what SQLite has,
+    and is raised by the next `aflush` of that thread. Reads of older
+    checkpoints, listings and cold threads wait for queued writes and then
+    go to SQLite.
+    """
+
+    def __init__(self, saver: AsyncSqliteSaver, max_hot_bytes: int = MAX_HOT_BYTES):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.max_hot_bytes = max_hot_bytes
+        self.hot_bytes = 0
+        # Compaction and direct queries share the saver's connection and lock
+        self.conn = saver.conn
+        self.lock = saver.lock
+        self._hot: OrderedDict[tuple[str, str], CheckpointTuple] = OrderedDict()
+        self._hot_sizes: dict[tuple[str, str], int] = {}
+        # Pending writes of each hot checkpoint, keyed by (task_id, idx) like the writes table
+        self._hot_writes: dict[tuple[str, str], dict[tuple[str, int], tuple[str, str, Any]]] = {}
+        self._queue: asyncio.Queue | None = None
+        self._writer: asyncio.Task | None = None
+        self._last_write: dict[str, asyncio.Future] = {}
+        # First failed write of each thread since its last aflush
+        self._failed: dict[str, Exception] = {}
+
+    async def setup(self) -> None:
+        await self.saver.setup()
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    # ---------------- Write-behind ----------------
+    def _enqueue(self, thread_id: str, write):
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._drain())
+        done = asyncio.get_running_loop().create_future()
+        self._last_write[thread_id] = done
+        self._queue.put_nowait((thread_id, write, done))
+
+    async def _drain(self):
+        while True:
+            thread_id, write, done = await self._queue.get()
+            try:
+                await write
+                done.set_result(None)
+            except Exception as e:
+                print(f"Background checkpoint write failed for thread {thread_id}: {e}")
+                self._failed.setdefault(thread_id, e)
+                # The in-memory checkpoint never reached disk; stop serving it
+                self.evict(thread_id)
+                done.set_result(None)
+            finally:
+                if self._last_write.get(thread_id) is done:
+                    del self._last_write[thread_id]
+
+    async def await_writes(self, thread_id: str | None = None) -> None:
+        """Wait for queued writes like `aflush`, leaving failures to be raised by it. For readers."""
+        if thread_id is None:
+            pending = list(self._last_write.values())
+        else:
+            pending = [self._last_write[thread_id]] if thread_id in self._last_write else []
+        for done in pending:
+            await asyncio.shield(done)
+
+    async def aflush(self, thread_id: str | None = None) -> None:
+        """
+        Wait until queued writes of one thread (or of all threads) reach
+        SQLite. Raises the first write that failed since the last flush.
+        """
+        await self.await_writes(thread_id)
+        if thread_id is None:
+            failures = list(self._failed.items())
+            self._failed.clear()
+        else:
+            failures = [(thread_id, self._failed.pop(thread_id))] if thread_id in self._failed else []
+        if failures:
+            failed_thread, error = failures[0]
+            raise RuntimeError(f"Checkpoint write for thread {failed_thread} did not reach SQLite") from error
+
+    # ---------------- Hot cache ----------------
+    def _forget(self, key: tuple[str, str]):
+        self._hot.pop(key, None)
+        self._hot_writes.pop(key, None)
+        self.hot_bytes -= self._hot_sizes.pop(key, 0)
+
+    def _remember(self, key: tuple[str, str], checkpoint_tuple: CheckpointTuple):
+        self._forget(key)
+        size = _approx_size(checkpoint_tuple.checkpoint)
+        if size > self.max_hot_bytes:
+            return
+        self._hot[key] = checkpoint_tuple
+        self._hot_sizes[key] = size
+        self.hot_bytes += size
+        self._hot_writes[key] = {
+            (task_id, idx): (task_id, channel, value)
+            for idx, (task_id, channel, value) in enumerate(checkpoint_tuple.pending_writes or [])
+        }
+        while self.hot_bytes > self.max_hot_bytes:
+            self._forget(next(iter(self._hot)))
+
+    def evict(self, thread_id: str):
+        """Drop a thread from memory, e.g. after its checkpoints were deleted."""
+        for key in [key for key in self._hot if key[0] == str(thread_id)]:
+            self._forget(key)
+
+    # ---------------- Checkpointer API ----------------
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = str(config["configurable"]["thread_id"])
+        key = (thread_id, config["configurable"].get("checkpoint_ns", ""))
+        hot = self._hot.get(key)
+        checkpoint_id = get_checkpoint_id(config)
+        if hot is not None and checkpoint_id in (None, hot.checkpoint["id"]):
+            self._hot.move_to_end(key)
+            return hot._replace(
+                checkpoint=copy_checkpoint(hot.checkpoint),
+                pending_writes=list(self._hot_writes[key].values()),
+            )
+
+        await self.await_writes(thread_id)
+        checkpoint_tuple = await self.saver.aget_tuple(config)
+        if checkpoint_tuple is not None and checkpoint_id is None:
+            self._remember(key, checkpoint_tuple)
+        return checkpoint_tuple
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        await self.await_writes(config["configurable"]["thread_id"] if config else None)
+        async for checkpoint_tuple in self.saver.alist(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        parent_id = config["configurable"].get("checkpoint_id")
+        parent_config = (
+            {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+            if parent_id
+            else None
+        )
+        # The write runs later on the writer task; it gets a snapshot, never the caller's objects.
+        # The hot entry shares it, since reads hand out copies.
+        checkpoint = _snapshot(checkpoint)
+        self._remember(
+            (thread_id, checkpoint_ns),
+            CheckpointTuple(
+                config=next_config,
+                checkpoint=checkpoint,
+                metadata=get_checkpoint_metadata(config, metadata),
+                parent_config=parent_config,
+                pending_writes=[],
+            ),
+        )
+        self._enqueue(thread_id, self.saver.aput(
+            {**config, "configurable": dict(config["configurable"])}, checkpoint, dict(metadata), dict(new_versions),
+        ))
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        key = (thread_id, config["configurable"].get("checkpoint_ns", ""))
+        hot = self._hot.get(key)
+        if hot is not None and hot.checkpoint["id"] == config["configurable"]["checkpoint_id"]:
+            # Same replace/ignore rules as the SQLite writes table
+            replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+            pending = self._hot_writes[key]
+            for idx, (channel, value) in enumerate(writes):
+                write_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if replace or write_key not in pending:
+                    pending[write_key] = (task_id, channel, value)
+        self._enqueue(thread_id, self.saver.aput_writes(
+            {**config, "configurable": dict(config["configurable"])}, list(writes), task_id, task_path,
+        ))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.evict(thread_id)
+        await self.await_writes(str(thread_id))
+        self._failed.pop(str(thread_id), None)
+        await self.saver.adelete_thread(thread_id)
@@ -1,34 +1,51 @@
 import aiosqlite
 from functools import partial
 import asyncio
+from collections import OrderedDict
 
 # Import async helpers from agent
-from agent import create_agent, run_async, submit_async_task, ingest_pdf
+from agent import create_agent, run_async, submit_async_task, open_stream_bridge, load_vectorstore, summary_memory, ingest_pdf as agent_ingest_pdf
+from compaction import run_compaction_forever, purge_deleted_threads
+from history_cache import HistoryCache, format_messages
+from prefetch import Prefetcher, PREFETCH_THREADS
+from transfer import export_ndjson
+from turn_metrics import metrics_by_user, metrics_by_thread, metrics_by_day
+from turn_stream import stream_turn as graph_stream_turn
+from run_control import RunRegistry
 
 # Import the new async auth and db functions
 from auth import register_user as auth_register_user, login_user as auth_login_user
 from database import (
     init_db,
     increment_ai_count as db_increment_ai_count,
-    store_conversation as db_store_conversation,
-    load_conversation as db_load_conversation,
+    create_conversation as db_create_conversation,
+    update_conversation_stats as db_update_conversation_stats,
     retrieve_all_threads as db_retrieve_all_threads,
     store_conversation_name as db_store_conversation_name,
     delete_conversation as db_delete_conversation,
     add_document as db_add_document,
     get_document_for_thread as db_get_document_for_thread,
+    recent_threads as db_recent_threads,
 )
 
 # ----------------- Unified Asynchronous Backend Setup -----------------
+_compaction_task = None
+
 async def setup_backend():
     # A single aiosqlite connection for the entire application
     conn = await aiosqlite.connect(database="chatbot.db")
+    # Takes effect only on a new, empty database; existing ones are switched with `python compaction.py`
+    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     
     # Initialize database schema
     await init_db(conn)
     
     # Create the async-compatible agent
     chatbot_agent = create_agent(conn)
+
+    # Prune old checkpoints and reclaim disk space in the background
+    global _compaction_task
+    _compaction_task = asyncio.create_task(run_compaction_forever(chatbot_agent.checkpointer))
     
     return chatbot_agent, conn
 
@@ -43,23 +60,128 @@ login_user = partial(auth_login_user, conn)
 
 # Database functions for UI state and user management
 increment_ai_count = partial(db_increment_ai_count, conn)
-store_conversation = partial(db_store_conversation, conn)
-load_conversation_db = partial(db_load_conversation, conn) 
+create_conversation = partial(db_create_conversation, conn)
+update_conversation_stats = partial(db_update_conversation_stats, conn)
 retrieve_all_threads_db = partial(db_retrieve_all_threads, conn)
 store_conversation_name = partial(db_store_conversation_name, conn)
-delete_conversation = partial(db_delete_conversation, conn)
+
+async def delete_conversation(thread_id, username):
+    """Deletes the conversation row, then the checkpoints the agent kept for it."""
+    await db_delete_conversation(conn, thread_id, username)
+    await chatbot.checkpointer.setup()
+    await chatbot.checkpointer.await_writes(str(thread_id))
+    async with chatbot.checkpointer.lock:
+        await purge_deleted_threads(conn, thread_id)
+    chatbot.checkpointer.evict(str(thread_id))
+    history_cache.invalidate(str(thread_id))
+    _document_cache.pop(str(thread_id), None)
+
+# Filtered stream of one turn: chat_node token deltas and tool start/end only.
+# Older turns are folded into the summary after each turn, never during one.
+stream_turn = partial(graph_stream_turn, chatbot, memory=summary_memory)
+
+# In-progress run of each thread, so the UI can stop it
+runs = RunRegistry()
+start_run = runs.start
+attach_run = runs.attach
+
+def stop_run(thread_id):
+    """Cancels the thread's streaming turn and its tool calls. Returns what was cut short, or None."""
+    report = runs.cancel(str(thread_id))
+    if report is not None:
+        print(f"Stopped run on thread {thread_id}: {report} (totals: {runs.stats()})")
+    return report
+
+# Bulk export of conversations as NDJSON; imports run offline with `python transfer.py import`
+export_conversations = partial(export_ndjson, conn, chatbot.checkpointer)
+
+# Latency, token and cost aggregates from turn_metrics
+usage_by_user = partial(metrics_by_user, conn)
+usage_by_thread = partial(metrics_by_thread, conn)
+usage_by_day = partial(metrics_by_day, conn)
 
 # Document related functions
 add_document = partial(db_add_document, conn)
-get_document_for_thread = partial(db_get_document_for_thread, conn)
-ingest_pdf = partial(ingest_pdf, conn) # Bind conn to ingest_pdf
+
+# Document info per thread, filled on first read and by the login prefetch, most recently used last
+MAX_CACHED_DOCUMENTS = 512
+_document_cache: OrderedDict = OrderedDict()
+
+async def _get_document(thread_id: str):
+    if thread_id in _document_cache:
+        _document_cache.move_to_end(thread_id)
+        return _document_cache[thread_id]
+    document = await db_get_document_for_thread(conn, thread_id)
+    _document_cache[thread_id] = document
+    while len(_document_cache) > MAX_CACHED_DOCUMENTS:
+        _document_cache.popitem(last=False)
+    return document
+
+async def get_document_for_thread(thread_id: str):
+    async with prefetcher.foreground():
+        return await _get_document(str(thread_id))
+
+async def ingest_pdf(file_bytes: bytes, thread_id: str, filename: str) -> dict:
+    result = await agent_ingest_pdf(conn, file_bytes, thread_id, filename)
+    _document_cache.pop(str(thread_id), None)
+    return result
 
 
 # ----------------- Special function for interacting with the agent's internal state -----------------
+history_cache = HistoryCache()
+prefetcher = Prefetcher()
+
+async def _latest_checkpoint_id(thread_id: str):
+    await chatbot.checkpointer.setup()
+    await chatbot.checkpointer.await_writes(thread_id)
+    async with conn.execute(
+        "SELECT checkpoint_id FROM checkpoints WHERE thread_id=? AND checkpoint_ns='' ORDER BY checkpoint_id DESC LIMIT 1",
+        (thread_id,),
+    ) as cursor:
+        row = await cursor.fetchone()
+    return row[0] if row else None
+
+async def _load_history(thread_id: str):
+    checkpoint_id = await _latest_checkpoint_id(thread_id)
+    if checkpoint_id is None:
+        return []
+
+    history = history_cache.get(thread_id, checkpoint_id)
+    if history is None:
+        # Pin the checkpoint so the cached history matches its key
+        state = await chatbot.aget_state(config={"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": checkpoint_id,
+        }})
+        history = format_messages(state.values.get("messages", []))
+        history_cache.put(thread_id, checkpoint_id, history)
+    return history
+
 async def load_conversation_from_checkpointer(thread_id: str):
     """
-    Loads conversation history directly from the LangGraph async checkpointer.
-    This reflects the agent's actual state.
+    Loads the formatted conversation history from the LangGraph async checkpointer.
+    This reflects the agent's actual state. Histories are cached per checkpoint,
+    so reopening a thread that has not changed skips checkpoint deserialization.
     """
-    state = await chatbot.aget_state(config={"configurable": {"thread_id": thread_id}})
-    return state.values.get("messages", [])
\ No newline at end of file
+    async with prefetcher.foreground():
+        return await _load_history(str(thread_id))
+
+
+# ----------------- Login prefetch -----------------
+async def prefetch_recent_threads(username: str):
+    """
+    Warms the history cache, document info and FAISS index of the user's most
+    recent threads in the background. Jobs yield to foreground requests.
+    """
+    thread_ids = await db_recent_threads(conn, username, PREFETCH_THREADS)
+
+    def warm(thread_id):
+        async def job():
+            await _load_history(thread_id)
+            if await _get_document(thread_id):
+                await load_vectorstore(thread_id)
+        return job
+
+    prefetcher.start(username, [warm(str(thread_id)) for thread_id in thread_ids])
+
+async def cancel_prefetch(username: str):
+    prefetcher.cancel(username)
@@ -0,0 +1,192 @@
+"""
+Chat model providers, selected by configuration instead of hard-coded.
+
+    LLM_PROVIDER=gemini|openai|standin   (default: gemini)
+    LLM_MODEL=<model name>               (provider default if unset)
+    LLM_OPTIONS='{"temperature": 0.2}'   (extra keyword arguments, JSON)
+
+The `standin` provider is a local chat model for offline, deterministic load
+tests of the whole graph, UI bridge and persistence stack. It streams tokens
+at a fixed rate, answers scripted prompts with tool calls, and injects latency
+and errors, e.g.
+
+    LLM_PROVIDER=standin LLM_OPTIONS='{"tokens_per_second": 40, "error_rate": 0.02}'
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream, generate_from_stream
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# ---------------- Provider Registry ----------------
+DEFAULT_PROVIDER = "gemini"
+PROVIDERS = {}
+
+
+def register_provider(name: str):
+    """Register a factory `(model: str | None, **options) -> BaseChatModel` under `name`."""
+    def decorator(factory):
+        PROVIDERS[name] = factory
+        return factory
+    return decorator
+
+
+@register_provider("gemini")
+def _gemini(model: str | None = None, **options):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model or "gemini-2.5-flash", **{"temperature": 0.7, **options})
+
+
+@register_provider("openai")
+def _openai(model: str | None = None, **options):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model or "gpt-4o-mini", **options)
+
+
+@register_provider("standin")
+def _standin(model: str | None = None, **options):
+    return StandInChatModel(**options)
+
+
+def get_llm(provider: str | None = None, model: str | None = None, **options) -> BaseChatModel:
+    """Build the chat model named by the arguments, falling back to LLM_PROVIDER / LLM_MODEL / LLM_OPTIONS."""
+    provider = provider or os.getenv("LLM_PROVIDER", DEFAULT_PROVIDER)
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}'. Available: {', '.join(PROVIDERS)}")
+    env_options = json.loads(os.getenv("LLM_OPTIONS") or "{}")
+    return PROVIDERS[provider](model or os.getenv("LLM_MODEL"), **{**env_options, **options})
+
+
+# ---------------- Local Stand-in Model ----------------
+# Prompt pattern -> tool call emitted when that tool is bound.
+DEFAULT_TOOL_SCRIPT = {
+    r"\b(stock|share price|ticker)\b": ("get_stock_price", {"symbol": "AAPL"}),
+    r"\b(search|news|latest)\b": ("duckduckgo_search", {"query": "latest news"}),
+    r"\b(pdf|document|uploaded)\b": ("rag_tool", {"query": "summary"}),
+    r"\b(sum|total|average)\b": ("batch_calculator", {"values": [1, 2, 3], "operation": "sum"}),
+}
+
+
+class StandInError(RuntimeError):
+    """Injected failure of the stand-in model."""
+
+
+class StandInChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for load tests.
+
+    Answers are `response_tokens` words streamed at `tokens_per_second` after
+    a first-token delay drawn from `latency_ms` +/- `latency_jitter_ms`. A
+    user message matching a pattern in `tool_script` yields that tool call if
+    the tool is bound; a turn ending in tool results gets a text answer.
+    Calls fail with StandInError at `error_rate`. All randomness comes from
+    `seed`, so a run can be replayed exactly.
+    """
+
+    tokens_per_second: float = 50.0
+    response_tokens: int = 60
+    latency_ms: float = 300.0
+    latency_jitter_ms: float = 100.0
+    error_rate: float = 0.0
+    tool_script: dict[str, tuple[str, dict]] = DEFAULT_TOOL_SCRIPT
+    seed: int = 0
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "standin"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _plan(self, messages: list[BaseMessage], tools: list[dict] | None) -> tuple[float, list[str], list[dict]]:
+        """Decide delay, text tokens and tool calls for one response."""
+        delay = max(0.0, self._rng.gauss(self.latency_ms, self.latency_jitter_ms)) / 1000
+        if self._rng.random() < self.error_rate:
+            raise StandInError("Injected stand-in model failure")
+
+        last = messages[-1] if messages else None
+        bound = {t["function"]["name"] for t in tools or []}
+        if isinstance(last, HumanMessage) and isinstance(last.content, str):
+            for pattern, (name, args) in self.tool_script.items():
+                if name in bound and re.search(pattern, last.content, re.IGNORECASE):
+                    return delay, [], [{"name": name, "args": dict(args), "id": f"call_{uuid.UUID(int=self._rng.getrandbits(128)).hex[:12]}"}]
+
+        lead = "Based on the tool results," if isinstance(last, ToolMessage) else "Stand-in answer:"
+        words = [lead, *(f"token{i}" for i in range(self.response_tokens))]
+        return delay, [w if i == 0 else f" {w}" for i, w in enumerate(words)], []
+
+    def _chunks(self, messages: list[BaseMessage], tokens: list[str], tool_calls: list[dict]) -> Iterator[ChatGenerationChunk]:
+        for token in tokens:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        # Word counts stand in for token usage, reported once on the last chunk
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(tokens) + len(tool_calls)
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(tool_calls)
+            ],
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        ))
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        delay, tokens, tool_calls = self._plan(messages, kwargs.get("tools"))
+        time.sleep(delay)
+        for chunk in self._chunks(messages, tokens, tool_calls):
+            if run_manager and chunk.message.content:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+            time.sleep(1 / self.tokens_per_second)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        delay, tokens, tool_calls = self._plan(messages, kwargs.get("tools"))
+        await asyncio.sleep(delay)
+        for chunk in self._chunks(messages, tokens, tool_calls):
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
@@ -0,0 +1,58 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+# Number of most recently active threads warmed after login.
+PREFETCH_THREADS = 5
+
+
+class Prefetcher:
+    """
+    Runs warm-up jobs on the backend loop, one batch per user and one job at
+    a time within a batch.
+
+    Foreground requests wrap themselves in `foreground()`; the prefetcher
+    waits until none are in flight before starting each job, so warming never
+    delays a user-visible request by more than the jobs already running.
+    Starting a new batch for a user cancels only that user's previous one.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @asynccontextmanager
+    async def foreground(self):
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.set()
+
+    def start(self, owner: str, jobs):
+        """Replace `owner`'s running batch with `jobs`, a list of zero-argument coroutine functions."""
+        self.cancel(owner)
+        task = asyncio.create_task(self._run(jobs))
+        self._tasks[owner] = task
+        task.add_done_callback(lambda done: self._tasks.pop(owner, None) if self._tasks.get(owner) is done else None)
+
+    def cancel(self, owner: str):
+        task = self._tasks.pop(owner, None)
+        if task is not None and not task.done():
+            task.cancel()
+
+    async def _run(self, jobs):
+        for job in jobs:
+            await self._idle.wait()
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A failed warm-up only means the foreground request does the work itself
+                print(f"Prefetch job failed: {e}")
+            await asyncio.sleep(0)
@@ -0,0 +1,97 @@
+import threading
+import time
+
+# ---------------- Run Control ----------------
+# Seconds a Stop waits for the cancelled run to settle its checkpoint.
+CANCEL_SETTLE_TIMEOUT = 5.0
+
+
+class RunHandle:
+    """
+    Cancellation handle for one streamed turn. Progress counters are updated
+    by stream_turn so a Stop can report what was cut short.
+    """
+
+    def __init__(self, thread_id: str, turn_id: str | None = None):
+        self.thread_id = thread_id
+        self.turn_id = turn_id
+        self.started_at = time.monotonic()
+        self.bridge = None
+        self.cancel_requested = False
+        self.tokens_streamed = 0
+        self.tool_calls_started = 0
+        self.tool_calls_finished = 0
+        self.report: dict | None = None
+        # Set once the run has ended and, if it was cancelled, its checkpoint is consistent
+        self.settled = threading.Event()
+
+    def cancel(self):
+        self.cancel_requested = True
+        if self.bridge is not None:
+            self.bridge.cancel()
+
+
+class RunRegistry:
+    """The in-progress run of each thread, shared by the UI threads and the backend loop."""
+
+    def __init__(self):
+        self._runs: dict[str, RunHandle] = {}
+        # Report of each thread's last cancelled run, until the UI picks it up
+        self._reports: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "cancelled": 0, "tokens_streamed": 0, "tool_calls_cancelled": 0, "model_calls_avoided": 0}
+
+    def start(self, thread_id: str, turn_id: str | None = None) -> RunHandle:
+        handle = RunHandle(thread_id, turn_id)
+        with self._lock:
+            previous = self._runs.get(thread_id)
+            self._runs[thread_id] = handle
+            self._reports.pop(thread_id, None)
+            self._stats["runs"] += 1
+        # A new message on a thread supersedes a run still going on it
+        if previous is not None:
+            previous.cancel()
+        return handle
+
+    def attach(self, handle: RunHandle, bridge):
+        """Tie the handle to the bridge carrying its stream; the run is finished when the bridge's producer ends."""
+        handle.bridge = bridge
+        bridge.add_done_callback(lambda _: self.finish(handle))
+        # Stop may have been pressed before the stream was started
+        if handle.cancel_requested:
+            bridge.cancel()
+
+    def finish(self, handle: RunHandle):
+        # A run cancelled before it started has no report of its own
+        if handle.cancel_requested and handle.report is None:
+            handle.report = {"tokens_streamed": 0, "tool_calls_cancelled": 0, "model_calls_avoided": 0}
+        with self._lock:
+            if self._runs.get(handle.thread_id) is handle:
+                del self._runs[handle.thread_id]
+            if handle.report is not None:
+                self._reports[handle.thread_id] = handle.report
+                self._stats["cancelled"] += 1
+                self._stats["tokens_streamed"] += handle.report["tokens_streamed"]
+                self._stats["tool_calls_cancelled"] += handle.report["tool_calls_cancelled"]
+                self._stats["model_calls_avoided"] += handle.report["model_calls_avoided"]
+        handle.settled.set()
+
+    def cancel(self, thread_id: str, timeout: float = CANCEL_SETTLE_TIMEOUT) -> dict | None:
+        """
+        Stop the thread's run and wait for it to settle. Returns its
+        cancellation report; a run that was already cancelled from the other
+        side (the stream's consumer went away) reports as well. None if
+        nothing was running.
+        """
+        with self._lock:
+            handle = self._runs.get(thread_id)
+        if handle is not None:
+            handle.cancel()
+            if not handle.settled.wait(timeout):
+                print(f"Run on thread {thread_id} did not settle within {timeout:.0f}s of Stop")
+        with self._lock:
+            return self._reports.pop(thread_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "active": len(self._runs)}
@@ -0,0 +1,231 @@
+import ast
+import math
+import operator
+import re
+
+# ---------------- Safe Expression Evaluator ----------------
+# Longest expression evaluated; longer input is left to the model.
+MAX_EXPRESSION_CHARS = 300
+# Integer powers above this exponent are computed in floating point.
+MAX_INT_EXPONENT = 64
+MAX_FACTORIAL = 170
+
+FUNCTIONS = {
+    "sqrt": math.sqrt, "abs": abs, "round": round, "floor": math.floor, "ceil": math.ceil,
+    "exp": math.exp, "log": math.log, "ln": math.log, "log10": math.log10, "log2": math.log2,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan, "asin": math.asin, "acos": math.acos, "atan": math.atan,
+    "min": min, "max": max,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+# unit -> (factor to the base unit, dimension)
+UNITS = {
+    "mm": (0.001, "length"), "cm": (0.01, "length"), "m": (1.0, "length"), "km": (1000.0, "length"),
+    "in": (0.0254, "length"), "inch": (0.0254, "length"), "ft": (0.3048, "length"), "yd": (0.9144, "length"),
+    "mi": (1609.344, "length"), "mile": (1609.344, "length"), "miles": (1609.344, "length"),
+    "mg": (1e-6, "mass"), "g": (0.001, "mass"), "kg": (1.0, "mass"), "t": (1000.0, "mass"),
+    "lb": (0.45359237, "mass"), "lbs": (0.45359237, "mass"), "oz": (0.028349523125, "mass"),
+    "ms": (0.001, "time"), "s": (1.0, "time"), "sec": (1.0, "time"), "min": (60.0, "time"),
+    "h": (3600.0, "time"), "hr": (3600.0, "time"), "day": (86400.0, "time"), "days": (86400.0, "time"),
+    "week": (604800.0, "time"), "weeks": (604800.0, "time"),
+    "ml": (0.001, "volume"), "l": (1.0, "volume"), "gal": (3.785411784, "volume"),
+    "b": (1.0, "data"), "kb": (1e3, "data"), "mb": (1e6, "data"), "gb": (1e9, "data"), "tb": (1e12, "data"),
+    "kib": (1024.0, "data"), "mib": (1024.0 ** 2, "data"), "gib": (1024.0 ** 3, "data"),
+}
+
+BINARY_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+
+
+class ExpressionError(ValueError):
+    """Raised for input that is not a supported arithmetic expression."""
+
+
+class Quantity:
+    """A number with a dimension map such as {"length": 1, "time": -1}; an empty map is a plain number."""
+
+    __slots__ = ("value", "dims")
+
+    def __init__(self, value, dims=None):
+        self.value = value
+        self.dims = {k: v for k, v in (dims or {}).items() if v}
+
+    def _combine(self, other, sign):
+        dims = dict(self.dims)
+        for k, v in other.dims.items():
+            dims[k] = dims.get(k, 0) + sign * v
+        return dims
+
+    def binary(self, op, other: "Quantity") -> "Quantity":
+        if op in (ast.Add, ast.Sub, ast.Mod, ast.FloorDiv):
+            if self.dims != other.dims:
+                raise ExpressionError("Cannot combine quantities with different units")
+            return Quantity(BINARY_OPS[op](self.value, other.value), self.dims)
+        if op is ast.Mult:
+            return Quantity(self.value * other.value, self._combine(other, 1))
+        if op is ast.Div:
+            if other.value == 0:
+                raise ExpressionError("Division by zero")
+            return Quantity(self.value / other.value, self._combine(other, -1))
+        if op is ast.Pow:
+            if other.dims:
+                raise ExpressionError("Exponents must be plain numbers")
+            exponent = other.value
+            if isinstance(self.value, int) and isinstance(exponent, int) and abs(exponent) > MAX_INT_EXPONENT:
+                value = float(self.value) ** exponent
+            else:
+                value = self.value ** exponent
+            if isinstance(value, complex):
+                raise ExpressionError("Result is not a real number")
+            if isinstance(value, int) and value.bit_length() > 1024:
+                value = float(value)
+            return Quantity(value, {k: v * exponent for k, v in self.dims.items()})
+        raise ExpressionError("Unsupported operator")
+
+
+def _preprocess(text: str) -> str:
+    text = text.replace("×", "*").replace("÷", "/").replace("−", "-").replace("^", "**")
+    # Thousands separators: 1,250,000
+    text = re.sub(r"(?<=\d),(?=\d{3}(?!\d))", "", text)
+    # Percentages: "15% of 80", "200 + 10%"; a % followed by an operand stays modulo
+    text = re.sub(r"(\d+(?:\.\d+)?)\s*%(?!\s*[\d(.a-zA-Z])", r"(\1/100)", text)
+    text = re.sub(r"(\d+(?:\.\d+)?)\s*%\s*of\b", r"(\1/100)*", text)
+    # Implicit multiplication binds tightest: "10 gb / 2 mb", "2pi", "3(4+5)"
+    text = re.sub(
+        r"(?<![\w.])(\d[\d.]*(?:[eE][+-]?\d+)?)(?![eE][+-]?\d)\s*([a-zA-Z_]\w*)",
+        lambda m: f"({m[1]}*{m[2]})" if m[2].lower() in UNITS or m[2].lower() in CONSTANTS else m[0],
+        text,
+    )
+    text = re.sub(r"(?<![\w.])(\d[\d.]*(?:[eE][+-]?\d+)?)\s*\(", r"\1*(", text)
+    return text
+
+
+class _Evaluator:
+    def visit(self, node) -> Quantity:
+        if isinstance(node, ast.Expression):
+            return self.visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return Quantity(node.value)
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            return self.visit(node.left).binary(type(node.op), self.visit(node.right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            operand = self.visit(node.operand)
+            return Quantity(-operand.value if isinstance(node.op, ast.USub) else operand.value, operand.dims)
+        if isinstance(node, ast.Name):
+            name = node.id.lower()
+            if name in CONSTANTS:
+                return Quantity(CONSTANTS[name])
+            if name in UNITS:
+                factor, dimension = UNITS[name]
+                return Quantity(factor, {dimension: 1})
+            raise ExpressionError(f"Unknown name '{node.id}'")
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id.lower()
+            args = [self.visit(arg) for arg in node.args]
+            if any(arg.dims for arg in args) and name not in ("abs", "round", "min", "max"):
+                raise ExpressionError(f"{name}() needs plain numbers")
+            if name in ("min", "max") and any(arg.dims != args[0].dims for arg in args):
+                raise ExpressionError(f"{name}() cannot compare quantities with different units")
+            if name == "round" and any(arg.dims for arg in args[1:]):
+                raise ExpressionError("round() needs a plain number of digits")
+            if name == "factorial":
+                if len(args) != 1 or args[0].value != int(args[0].value) or not 0 <= args[0].value <= MAX_FACTORIAL:
+                    raise ExpressionError(f"factorial() needs an integer between 0 and {MAX_FACTORIAL}")
+                return Quantity(math.factorial(int(args[0].value)))
+            if name not in FUNCTIONS:
+                raise ExpressionError(f"Unknown function '{node.func.id}'")
+            try:
+                value = FUNCTIONS[name](*(arg.value for arg in args))
+            except (TypeError, ValueError) as e:
+                raise ExpressionError(f"{name}(): {e}") from e
+            return Quantity(value, args[0].dims if args else None)
+        raise ExpressionError("Unsupported syntax")
+
+
+def _parse_target(text: str):
+    """Split a trailing "in <unit>" / "to <unit>" conversion off the expression."""
+    match = re.fullmatch(r"(.+?)\s+(?:in|to|as)\s+([a-zA-Z]+)\s*", text)
+    if match and match.group(2).lower() in UNITS:
+        return match.group(1), match.group(2)
+    return text, None
+
+
+def evaluate(expression: str) -> tuple[float, str | None]:
+    """
+    Evaluate an arithmetic expression without eval(). Supports + - * / // % **
+    (and ^), parentheses, percentages, the functions in FUNCTIONS plus
+    factorial, the constants pi/e/tau and the units in UNITS, e.g.
+    "3 km + 200 m in mi". Returns (value, unit name or None).
+    """
+    if len(expression) > MAX_EXPRESSION_CHARS:
+        raise ExpressionError("Expression is too long")
+    body, target = _parse_target(expression.strip())
+    try:
+        tree = ast.parse(_preprocess(body), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError("Not an arithmetic expression") from e
+    try:
+        result = _Evaluator().visit(tree)
+    except (OverflowError, ZeroDivisionError) as e:
+        raise ExpressionError(str(e)) from e
+    if isinstance(result.value, float) and not math.isfinite(result.value):
+        raise ExpressionError("Result is not a finite number")
+
+    if target is not None:
+        factor, dimension = UNITS[target.lower()]
+        if result.dims != {dimension: 1}:
+            raise ExpressionError(f"Cannot convert to {target}")
+        return result.value / factor, target
+    if not result.dims:
+        return result.value, None
+    if len(result.dims) == 1:
+        (dimension, power), = result.dims.items()
+        base = next(name for name, (factor, dim) in UNITS.items() if dim == dimension and factor == 1.0)
+        return result.value, base if power == 1 else f"{base}^{power}"
+    raise ExpressionError("Result has compound units; add 'in <unit>'")
+
+
+def format_number(value) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        value = int(value)
+    if isinstance(value, int):
+        return f"{value:,}" if abs(value) >= 10000 else str(value)
+    return f"{value:.12g}"
+
+
+# ---------------- Arithmetic Router ----------------
+_LEAD_IN = re.compile(r"^\s*(?:what(?:'s| is)|calculate|compute|evaluate|solve|how much is)\s+", re.IGNORECASE)
+_OPERATOR = re.compile(r"[-+*/^%×÷]|\*\*|\b(?:in|to|of)\b|\w\(")
+# Without a lead-in, only bare numbers and operators are treated as a calculation.
+_PURE_EXPRESSION = re.compile(r"[\d\s.,+\-*/^%×÷−()]+")
+# Phone numbers, dates and IDs: "555-1234", "2024-01-05", "0800-1".
+_DIGIT_GROUPS = re.compile(r"(?<![\d.])\d+(?:-\d+){2,}(?![\d.])|(?<![\d.])\d{3,}-\d{3,}(?![\d.])|(?<![\d.])0\d*-\d+|\d-0\d")
+# "200 + 10%" usually means 220, not 200.1; that reading is left to the model.
+_RELATIVE_PERCENT = re.compile(r"[+\-−]\s*\d+(?:\.\d+)?\s*%(?!\s*(?:of\b|[\d(]))")
+
+
+def route_arithmetic(message: str) -> str | None:
+    """
+    Answer a message that is nothing but an arithmetic expression, e.g.
+    "what is 12% of 1,250?" or "(3+4)^2". Words, units and functions need a
+    lead-in such as "what is" or "calculate". Returns the reply text, or None
+    if the message needs the model.
+    """
+    stripped = message.strip()
+    text = _LEAD_IN.sub("", stripped).rstrip(" ?=.!")
+    explicit = text != stripped.rstrip(" ?=.!")
+    if not text or not re.search(r"\d", text) or not _OPERATOR.search(text):
+        return None
+    if not explicit and not _PURE_EXPRESSION.fullmatch(text):
+        return None
+    if _DIGIT_GROUPS.search(text) or _RELATIVE_PERCENT.search(text):
+        return None
+    try:
+        value, unit = evaluate(text)
+        result = format_number(value) + (f" {unit}" if unit else "")
+    except (ValueError, ArithmeticError, RecursionError):
+        return None
+    # The expression is user text; code formatting keeps "*" and "_" from rendering as markdown
+    return f"`{text.replace('`', '')}` = **{result}**"
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+# ---------------- Semantic Cache ----------------
+# Cosine similarity above which two prompts are treated as the same question.
+SIMILARITY_THRESHOLD = 0.92
+# Seconds a cached answer may be served.
+CACHE_TTL = 6 * 60 * 60
+MAX_ENTRIES = 5000
+# Only prompts with at most this many earlier user messages are cached or
+# served; longer conversations make answers depend on more than the prompt.
+MAX_CONTEXT_TURNS = 1
+# "user" keeps answers per user; "global" shares them between all users.
+CACHE_SCOPE = os.getenv("SEMANTIC_CACHE_SCOPE", "user")
+
+# Numbers and capitalized words; embeddings barely tell "Alice" from "Bob" or 3 from 4.
+_ENTITY = re.compile(r"\d+(?:[.,]\d+)*|\b[A-Z][\w'-]*")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def prompt_entities(prompt: str) -> list[str]:
+    """
+    Digits and proper nouns of a prompt, in order. Capitalized words that
+    start a sentence, and "I", are not counted as proper nouns.
+    """
+    found = []
+    for match in _ENTITY.finditer(prompt):
+        token = match.group()
+        if token[0].isdigit():
+            found.append(token)
+            continue
+        before = prompt[:match.start()].rstrip()
+        if not before or before[-1] in ".!?:\"'(" or token.split("'")[0] == "I":
+            continue
+        found.append(token.casefold())
+    return found
+
+
+def cache_context(messages: list[BaseMessage]) -> tuple[str, str] | None:
+    """
+    The prompt of the turn in progress and a key for what must match exactly
+    besides its meaning: the user messages before it and the prompt's own
+    digits and proper nouns. None if the turn is not eligible: it already
+    used tools, or the conversation is too long for the prompt alone to
+    determine the answer.
+    """
+    if not messages or not isinstance(messages[-1], HumanMessage) or not isinstance(messages[-1].content, str):
+        return None
+    earlier = [m for m in messages[:-1] if isinstance(m, HumanMessage)]
+    if len(earlier) > MAX_CONTEXT_TURNS:
+        return None
+    context = "\n".join(_normalize(m.content) for m in earlier if isinstance(m.content, str))
+    entities = "\x1f".join(prompt_entities(messages[-1].content))
+    return messages[-1].content, hashlib.sha256(f"{context}\x00{entities}".encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """
+    Caches tool-free answers by the embedding of the prompt that produced them.
+
+    Prompt embeddings are kept in one normalized float32 matrix, next to an
+    integer array with the id of each entry's (scope, context) key, so a
+    lookup is a single matrix-vector product masked by two vectorized
+    comparisons. Expired entries are reused first; when none has expired and
+    the index is full the least recently served entry is evicted.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = SIMILARITY_THRESHOLD,
+        ttl: float = CACHE_TTL,
+        max_entries: int = MAX_ENTRIES,
+        scope: str = CACHE_SCOPE,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.scope = scope
+        self._vectors: np.ndarray | None = None
+        self._expires = np.zeros(0)
+        self._last_used = np.zeros(0)
+        self._keys: list[tuple[str, str] | None] = []
+        # Integer id per distinct key, and how many entries hold it
+        self._key_of = np.zeros(0, dtype=np.int64)
+        self._key_ids: dict[tuple[str, str], int] = {}
+        self._key_refs: dict[tuple[str, str], int] = {}
+        self._next_key_id = 0
+        self._answers: list[str | None] = []
+        self.hits = 0
+        self.misses = 0
+
+    def scope_key(self, username: str | None, scope: str | None = None) -> str:
+        return (username or "") if (scope or self.scope) == "user" else ""
+
+    async def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(await asyncio.to_thread(self.embeddings.embed_query, text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _match(self, vector: np.ndarray, key: tuple[str, str], now: float) -> int | None:
+        key_id = self._key_ids.get(key)
+        if self._vectors is None or key_id is None:
+            return None
+        size = len(self._keys)
+        live = (self._expires[:size] > now) & (self._key_of[:size] == key_id)
+        if not live.any():
+            return None
+        scores = np.where(live, self._vectors[:size] @ vector, -1.0)
+        best = int(np.argmax(scores))
+        return best if scores[best] >= self.threshold else None
+
+    async def lookup(self, prompt: str, scope_key: str, context_key: str):
+        """Return (cached answer or None, prompt embedding) so a miss can be stored without re-embedding."""
+        vector = await self._embed(prompt)
+        now = time.time()
+        index = self._match(vector, (scope_key, context_key), now)
+        if index is None:
+            self.misses += 1
+            return None, vector
+        self.hits += 1
+        self._last_used[index] = now
+        return self._answers[index], vector
+
+    def _grow(self, dim: int):
+        capacity = min(self.max_entries, max(64, 2 * len(self._expires)))
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        expires, last_used = np.zeros(capacity), np.zeros(capacity)
+        key_of = np.full(capacity, -1, dtype=np.int64)
+        if self._vectors is not None:
+            vectors[:len(self._keys)] = self._vectors[:len(self._keys)]
+            expires[:len(self._keys)] = self._expires[:len(self._keys)]
+            last_used[:len(self._keys)] = self._last_used[:len(self._keys)]
+            key_of[:len(self._keys)] = self._key_of[:len(self._keys)]
+        self._vectors, self._expires, self._last_used, self._key_of = vectors, expires, last_used, key_of
+
+    def _slot(self, dim: int, now: float) -> int:
+        size = len(self._keys)
+        expired = np.flatnonzero(self._expires[:size] <= now)
+        if expired.size:
+            return int(expired[0])
+        if size < self.max_entries:
+            if self._vectors is None or size == len(self._expires):
+                self._grow(dim)
+            self._keys.append(None)
+            self._answers.append(None)
+            return size
+        return int(np.argmin(self._last_used))
+
+    def _key_id(self, key: tuple[str, str]) -> int:
+        if key not in self._key_ids:
+            self._key_ids[key] = self._next_key_id
+            self._next_key_id += 1
+        self._key_refs[key] = self._key_refs.get(key, 0) + 1
+        return self._key_ids[key]
+
+    def _release_key(self, key: tuple[str, str] | None):
+        if key is None:
+            return
+        self._key_refs[key] -= 1
+        if not self._key_refs[key]:
+            del self._key_refs[key], self._key_ids[key]
+
+    def store(self, vector: np.ndarray, scope_key: str, context_key: str, answer: str):
+        now = time.time()
+        index = self._slot(vector.shape[0], now)
+        self._release_key(self._keys[index])
+        self._vectors[index] = vector
+        self._keys[index] = (scope_key, context_key)
+        self._key_of[index] = self._key_id(self._keys[index])
+        self._answers[index] = answer
+        self._expires[index] = now + self.ttl
+        self._last_used[index] = now
+
+    @staticmethod
+    def cacheable_answer(response: AIMessage) -> bool:
+        return not response.tool_calls and isinstance(response.content, str) and bool(response.content.strip())
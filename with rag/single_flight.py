@@ -0,0 +1,63 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key starts
+    the work, later callers with the same key await the same future until it
+    completes. The shared task is shielded, so cancelling or timing out one
+    caller never cancels it for the others; once every caller has gone away
+    it is cancelled too. Calls and executions are counted per name to report
+    how much was coalesced.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Callers still awaiting each shared future
+        self._waiters: dict[asyncio.Future, int] = {}
+        self._stats: dict[str, dict[str, int]] = {}
+
+    async def run(self, name: str, key: str, factory):
+        """Await `factory()` once for all concurrent callers of `key`. Returns (result, started_by_this_caller)."""
+        stats = self._stats.setdefault(name, {"calls": 0, "executions": 0, "abandoned": 0})
+        stats["calls"] += 1
+        future = self._inflight.get(key)
+        # A cancelled execution is never joined; this caller starts a fresh one
+        leader = future is None or future.cancelled()
+        if leader:
+            stats["executions"] += 1
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future), leader
+        except asyncio.CancelledError:
+            # The shared execution was cancelled, not this caller: report it as an ordinary failure
+            if future.cancelled() and not asyncio.current_task().cancelling():
+                raise RuntimeError(f"Shared {name} call was cancelled") from None
+            raise
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                if not future.done():
+                    stats["abandoned"] += 1
+                    # Unpublish first, so no caller can join the execution being cancelled
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+                    future.cancel()
+
+    def _finished(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller has gone away
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict:
+        return {
+            name: {**stats, "coalesced": stats["calls"] - stats["executions"],
+                   "coalescing_ratio": 1 - stats["executions"] / stats["calls"] if stats["calls"] else 0.0}
+            for name, stats in self._stats.items()
+        }
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import httpx
+
+# ---------------- Alpha Vantage ----------------
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY", "8S6VBWTFZH9U6HDA")
+# Seconds a quote is served from memory before it is fetched again.
+QUOTE_TTL = 60.0
+# Symbols kept in the quote cache; the oldest entries are dropped first.
+MAX_CACHED_QUOTES = 1024
+REQUEST_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+# Retries after the first attempt, for connection errors, 429 and 5xx responses.
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+
+
+class QuoteClient:
+    """
+    Fetches GLOBAL_QUOTE data over one pooled keep-alive connection set.
+
+    Quotes are cached per symbol for `ttl` seconds, and concurrent requests
+    for a symbol that is being fetched share that single upstream call.
+    Rate-limit and error payloads from Alpha Vantage are returned but not
+    cached. At most `max_cached` symbols are kept, and expired quotes are
+    dropped whenever a new one is stored.
+    """
+
+    def __init__(self, base_url: str = ALPHA_VANTAGE_URL, api_key: str = ALPHA_VANTAGE_API_KEY, ttl: float = QUOTE_TTL,
+                 max_cached: int = MAX_CACHED_QUOTES):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self._client: httpx.AsyncClient | None = None
+        # symbol -> (expires_at, quote), in insertion order, which is also expiry order
+        self._cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created lazily so the pool belongs to the backend event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=POOL_LIMITS)
+        return self._client
+
+    async def _fetch(self, symbol: str) -> dict:
+        params = {"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": self.api_key}
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = await self._http().get(self.base_url, params=params)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == MAX_RETRIES:
+                    response.raise_for_status()
+            except httpx.TransportError:
+                if attempt == MAX_RETRIES:
+                    raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    async def get_quote(self, symbol: str) -> dict:
+        symbol = symbol.strip().upper()
+        cached = self._cache.get(symbol)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        pending = self._inflight.get(symbol)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(symbol))
+            self._inflight[symbol] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(symbol, None))
+        # Shielded so one caller timing out does not cancel the fetch for the others
+        quote = await asyncio.shield(pending)
+        if "Global Quote" in quote and quote["Global Quote"]:
+            self._store(symbol, quote)
+        return quote
+
+    def _store(self, symbol: str, quote: dict):
+        now = time.monotonic()
+        self._cache.pop(symbol, None)
+        self._cache[symbol] = (now + self.ttl, quote)
+        while self._cache:
+            oldest, (expires_at, _) = next(iter(self._cache.items()))
+            if expires_at > now and len(self._cache) <= self.max_cached:
+                break
+            del self._cache[oldest]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
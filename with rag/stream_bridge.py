@@ -0,0 +1,174 @@
+import asyncio
+import concurrent.futures
+import time
+from collections import deque
+
+# ---------------- Stream Bridge ----------------
+# Frames buffered before the producer is made to wait for the consumer.
+MAX_BUFFERED_FRAMES = 64
+# Token deltas are merged into one frame up to this many characters.
+MAX_FRAME_CHARS = 2048
+# A consumer that takes nothing for this long is treated as gone.
+CONSUMER_STALL_TIMEOUT = 60.0
+
+
+class ConsumerStalled(RuntimeError):
+    """The consumer stopped taking frames while the buffer was full."""
+
+
+class StreamBridge:
+    """
+    Carries a stream produced on the backend event loop to a synchronous
+    consumer thread (the Streamlit script).
+
+    The buffer is bounded: when `max_frames` frames are waiting, the producer
+    blocks in `put` / `put_token`, which in turn pauses the graph run instead
+    of queueing events without limit. Consecutive token deltas are merged into
+    one frame, and the consumer takes every buffered frame per round-trip, so
+    a slow consumer receives fewer, larger token frames.
+
+    Cancellation runs both ways: closing the consumer iterator (the script
+    stops or the browser goes away) cancels the producer task, and a producer
+    that fails or is cancelled ends the consumer's iteration. A consumer that
+    stalls for `stall_timeout` with a full buffer fails the producer with
+    ConsumerStalled.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_frames: int = MAX_BUFFERED_FRAMES,
+                 stall_timeout: float = CONSUMER_STALL_TIMEOUT):
+        self.loop = loop
+        self.max_frames = max_frames
+        self.stall_timeout = stall_timeout
+        # [kind, payload, enqueued_at]; only touched on the event loop
+        self._buffer: deque[list] = deque()
+        self._changed = asyncio.Condition()
+        self._closed = False
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+        self._stats = {
+            "frames": 0, "token_deltas": 0, "batches": 0, "max_depth": 0, "depth_total": 0,
+            "max_lag_ms": 0.0, "lag_total_ms": 0.0, "producer_wait_ms": 0.0,
+        }
+
+    # ---- producer side (event loop) ----
+    async def _wait_for_space(self):
+        if len(self._buffer) < self.max_frames:
+            return
+        start = time.perf_counter()
+        try:
+            while len(self._buffer) >= self.max_frames:
+                await asyncio.wait_for(self._changed.wait(), self.stall_timeout)
+        except asyncio.TimeoutError:
+            raise ConsumerStalled(f"Consumer took no frames for {self.stall_timeout:g}s") from None
+        finally:
+            self._stats["producer_wait_ms"] += (time.perf_counter() - start) * 1000
+
+    async def put(self, kind: str, payload=None):
+        """Append one frame, waiting while the buffer is full."""
+        async with self._changed:
+            await self._wait_for_space()
+            self._buffer.append([kind, payload, time.perf_counter()])
+            self._stats["frames"] += 1
+            self._stats["max_depth"] = max(self._stats["max_depth"], len(self._buffer))
+            self._changed.notify_all()
+
+    async def put_token(self, text: str):
+        """Append a token delta, merging it into the last frame if that is an unconsumed token frame."""
+        self._stats["token_deltas"] += 1
+        async with self._changed:
+            last = self._buffer[-1] if self._buffer else None
+            if last is not None and last[0] == "token" and len(last[1]) + len(text) <= MAX_FRAME_CHARS:
+                last[1] += text
+                return
+        await self.put("token", text)
+
+    async def _close(self, error: BaseException | None = None):
+        async with self._changed:
+            self._closed = True
+            self._error = error
+            self._changed.notify_all()
+
+    async def _run(self, producer):
+        try:
+            await producer(self)
+        except asyncio.CancelledError:
+            await self._close()
+            raise
+        except Exception as e:
+            await self._close(e)
+        else:
+            await self._close()
+
+    def _spawn(self, producer):
+        self._task = self.loop.create_task(self._run(producer))
+        # A task cancelled before its first step never enters _run; close for it
+        self._task.add_done_callback(lambda task: None if self._closed else self.loop.create_task(self._close()))
+
+    def start(self, producer):
+        """Run `producer(bridge)` on the loop; it calls put / put_token and returns when the stream ends."""
+        self.loop.call_soon_threadsafe(self._spawn, producer)
+        return self
+
+    def add_done_callback(self, fn):
+        """Call `fn(task)` on the loop once the producer task has really ended, cancelled or not."""
+        self.loop.call_soon_threadsafe(lambda: self._task.add_done_callback(fn))
+
+    def cancel(self):
+        # Scheduled after start(), so the task exists by the time this runs
+        self.loop.call_soon_threadsafe(lambda: self._task is None or self._task.done() or self._task.cancel())
+
+    # ---- consumer side (any thread) ----
+    async def _take(self) -> list[tuple] | None:
+        async with self._changed:
+            while not self._buffer and not self._closed:
+                await self._changed.wait()
+            if not self._buffer:
+                return None
+            now = time.perf_counter()
+            lag_ms = (now - self._buffer[0][2]) * 1000
+            self._stats["batches"] += 1
+            self._stats["depth_total"] += len(self._buffer)
+            self._stats["lag_total_ms"] += lag_ms
+            self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+            frames = [(kind, payload) for kind, payload, _ in self._buffer]
+            self._buffer.clear()
+            self._changed.notify_all()
+            return frames
+
+    def batches(self, poll_interval: float | None = None):
+        """
+        Yield lists of (kind, payload) frames until the producer finishes. A
+        producer error is delivered as a final ("error", exception) frame.
+        With `poll_interval`, an empty list is yielded whenever no frame came
+        for that long, so the consumer regains control while the producer is
+        quiet (e.g. during a long tool call). Closing this iterator early
+        cancels the producer.
+        """
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.run_coroutine_threadsafe(self._take(), self.loop)
+                try:
+                    frames = pending.result(poll_interval)
+                except concurrent.futures.TimeoutError:
+                    yield []
+                    continue
+                pending = None
+                if frames is None:
+                    break
+                yield frames
+            if self._error is not None:
+                yield [("error", self._error)]
+        finally:
+            if pending is not None:
+                pending.cancel()
+            self.cancel()
+
+    def stats(self) -> dict:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "avg_depth": self._stats["depth_total"] / batches if batches else 0.0,
+            "avg_lag_ms": self._stats["lag_total_ms"] / batches if batches else 0.0,
+        }
@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import weakref
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# ---------------- Summary Settings ----------------
+# Fold older turns once the un-summarized tail grows past this many messages.
+SUMMARY_TRIGGER_MESSAGES = 24
+# The newest messages are never folded, they are sent to the LLM verbatim.
+KEEP_RECENT_MESSAGES = 8
+# Tool outputs are cut to this many characters in the summarizer prompt.
+TOOL_PREVIEW_CHARS = 300
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the existing summary with the new messages below. Keep facts, names, numbers, "
+    "decisions and open questions; drop small talk. Reply with the updated summary only."
+)
+
+
+def summary_message(summary: str) -> SystemMessage:
+    """System message carrying the rolling summary into the LLM prompt."""
+    return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+
+def _fold_boundary(messages: list[BaseMessage], start: int) -> int | None:
+    """
+    Index up to which messages can be folded: the start of the last turn
+    (a HumanMessage) that leaves at least KEEP_RECENT_MESSAGES unfolded.
+    Folding on a turn boundary keeps tool calls and their results together.
+    """
+    if len(messages) - start <= SUMMARY_TRIGGER_MESSAGES:
+        return None
+    for index in range(len(messages) - KEEP_RECENT_MESSAGES, start, -1):
+        if isinstance(messages[index], HumanMessage):
+            return index
+    return None
+
+
+def unsummarized_start(state: dict) -> int:
+    """
+    Index of the first message not folded into the summary. The fold is
+    anchored on the id of its last message, so the position is recomputed
+    from the current message list instead of trusting a stored index.
+    """
+    messages = state.get("messages", [])
+    anchor = state.get("summarized_through")
+    if anchor:
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index].id == anchor:
+                return index + 1
+    return 0
+
+
+def _transcript(messages: list[BaseMessage]) -> str:
+    lines = []
+    for msg in messages:
+        content = msg.content if isinstance(msg.content, str) else str(msg.content)
+        if isinstance(msg, HumanMessage):
+            lines.append(f"User: {content}")
+        elif isinstance(msg, AIMessage):
+            if content:
+                lines.append(f"Assistant: {content}")
+            for call in msg.tool_calls or []:
+                lines.append(f"Assistant called {call.get('name')} with {call.get('args')}")
+        elif isinstance(msg, ToolMessage):
+            lines.append(f"Tool {msg.name or ''}: {content[:TOOL_PREVIEW_CHARS]}")
+    return "\n".join(lines)
+
+
+class SummaryMemory:
+    """
+    Keeps a rolling summary of older turns in the graph state.
+
+    Folding happens between turns: stream_turn calls `schedule` once a run
+    has ended and its checkpoints are flushed. The summarizer call runs as a
+    background task that reads the thread's latest state, and its result is
+    written back with `aupdate_state` while holding the thread's lock, which
+    every run on the thread also holds, so the write never lands in the
+    middle of a run. Only the messages aged out since the last fold are sent
+    to the summarizer, together with the previous summary.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.graph = None  # set by create_agent once the graph is compiled
+        self._tasks: dict[str, asyncio.Task] = {}
+        # A thread's lock lives only while a run or a fold holds it
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def lock(self, thread_id: str) -> asyncio.Lock:
+        """Lock serializing runs and summary writes on one thread."""
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = self._locks[thread_id] = asyncio.Lock()
+        return lock
+
+    def schedule(self, thread_id: str):
+        """Fold the thread's aged-out turns in the background, if enough have piled up."""
+        if self.graph is None or thread_id in self._tasks:
+            return
+        # A fresh context keeps the summarizer out of the UI's event stream
+        task = asyncio.create_task(self._fold(thread_id), context=contextvars.Context())
+        self._tasks[thread_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(thread_id, None))
+
+    async def _fold(self, thread_id: str):
+        config = {"configurable": {"thread_id": thread_id}}
+        try:
+            state = (await self.graph.aget_state(config)).values
+            messages = state.get("messages", [])
+            start = unsummarized_start(state)
+            end = _fold_boundary(messages, start)
+            if end is None or messages[end - 1].id is None:
+                return
+
+            summary = state.get("summary", "")
+            prompt = f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{_transcript(messages[start:end])}"
+            response = await self.llm.ainvoke([SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=prompt)])
+
+            async with self.lock(thread_id):
+                # Turns finished meanwhile come after the anchor; anything else means the fold is stale
+                current = (await self.graph.aget_state(config)).values
+                anchor = messages[end - 1].id
+                if current.get("summarized_through") != state.get("summarized_through") or not any(
+                    m.id == anchor for m in current.get("messages", [])
+                ):
+                    return
+                await self.graph.aupdate_state(
+                    config,
+                    {"summary": response.content, "summarized_through": anchor},
+                    # As the last node of a finished turn, so the thread has nothing left to run
+                    as_node="chat_node",
+                )
+        except Exception as e:
+            # The fold is retried after the next turn, since the anchor did not move
+            print(f"Failed to update conversation summary for {thread_id}: {e}")
@@ -0,0 +1,43 @@
+import pytest
+
+from safe_math import ExpressionError, evaluate, route_arithmetic
+
+
+@pytest.mark.parametrize("expression, value, unit", [
+    ("2 + 3 * 4", 14, None),
+    ("(3+4)^2", 49, None),
+    ("12% of 1,250", 150, None),
+    ("max(1 km, 300 m)", 1000, "m"),
+    ("min(2, 7, 3)", 2, None),
+])
+def test_evaluate(expression, value, unit):
+    assert evaluate(expression) == (pytest.approx(value), unit)
+
+
+@pytest.mark.parametrize("expression", [
+    "min(1 km, 5 s)",
+    "max(2 kg, 3 m, 1 kg)",
+    "min(1 km, 5)",
+    "round(1.5 km, 2 s)",
+])
+def test_functions_reject_mixed_units(expression):
+    with pytest.raises(ExpressionError):
+        evaluate(expression)
+
+
+def test_non_finite_results_are_rejected():
+    with pytest.raises(ExpressionError):
+        evaluate("1e308*10")
+
+
+@pytest.mark.parametrize("message, reply", [
+    ("3*4*5", "`3*4*5` = **60**"),
+    ("what is 12% of 1,250?", "`12% of 1,250` = **150**"),
+    ("555-1234", None),
+    ("2024-01-05", None),
+    ("1e308*10", None),
+    ("200 + 10%", None),
+    ("3 km + 200 m in mi", None),
+])
+def test_route_arithmetic(message, reply):
+    assert route_arithmetic(message) == reply
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+import stock_quotes
+from stock_quotes import QuoteClient
+
+
+def quote(symbol: str, price: str = "100.0000") -> dict:
+    return {"Global Quote": {"01. symbol": symbol, "05. price": price}}
+
+
+class StubAlphaVantage:
+    """
+    Local stand-in for the Alpha Vantage endpoint. Each symbol is answered
+    from its list of (status, payload) responses in order, the last one
+    repeating; every request is counted per symbol.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.responses: dict[str, list[tuple[int, dict]]] = {}
+        self.hits: dict[str, int] = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                symbol = parse_qs(urlparse(self.path).query)["symbol"][0]
+                count = stub.hits[symbol] = stub.hits.get(symbol, 0) + 1
+                script = stub.responses.get(symbol) or [(200, quote(symbol))]
+                status, payload = script[min(count, len(script)) - 1]
+                time.sleep(stub.delay)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/query"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubAlphaVantage()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(stock_quotes, "RETRY_BACKOFF", 0.0)
+
+
+def run(client: QuoteClient, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_retries_server_errors_and_rate_limit_status(stub):
+    stub.responses["IBM"] = [(503, {}), (429, {}), (200, quote("IBM"))]
+    client = QuoteClient(base_url=stub.url, api_key="test")
+
+    assert run(client, client.get_quote("ibm")) == quote("IBM")
+    assert stub.hits["IBM"] == 3
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.responses["IBM"] = [(500, {})]
+    client = QuoteClient(base_url=stub.url, api_key="test")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(client, client.get_quote("IBM"))
+    assert stub.hits["IBM"] == stock_quotes.MAX_RETRIES + 1
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.responses["IBM"] = [(404, {})]
+    client = QuoteClient(base_url=stub.url, api_key="test")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(client, client.get_quote("IBM"))
+    assert stub.hits["IBM"] == 1
+
+
+def test_quotes_are_cached_until_ttl(stub):
+    client = QuoteClient(base_url=stub.url, api_key="test", ttl=0.2)
+
+    async def scenario():
+        await client.get_quote("IBM")
+        await client.get_quote(" ibm ")
+        assert stub.hits["IBM"] == 1
+        await asyncio.sleep(0.3)
+        await client.get_quote("IBM")
+
+    run(client, scenario())
+    assert stub.hits["IBM"] == 2
+
+
+def test_concurrent_requests_share_one_fetch():
+    server = StubAlphaVantage(delay=0.2)
+    try:
+        client = QuoteClient(base_url=server.url, api_key="test")
+
+        async def scenario():
+            return await asyncio.gather(*(client.get_quote("IBM") for _ in range(5)))
+
+        assert run(client, scenario()) == [quote("IBM")] * 5
+        assert server.hits["IBM"] == 1
+    finally:
+        server.close()
+
+
+@pytest.mark.parametrize("payload", [
+    {"Note": "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute."},
+    {"Information": "You have reached the 25 requests per day limit."},
+    {"Error Message": "Invalid API call."},
+    {"Global Quote": {}},
+])
+def test_rate_limit_and_error_payloads_are_not_cached(stub, payload):
+    stub.responses["IBM"] = [(200, payload), (200, quote("IBM"))]
+    client = QuoteClient(base_url=stub.url, api_key="test")
+
+    async def scenario():
+        assert await client.get_quote("IBM") == payload
+        assert await client.get_quote("IBM") == quote("IBM")
+
+    run(client, scenario())
+    assert stub.hits["IBM"] == 2
+
+
+def test_cache_is_capped_and_drops_expired_quotes(stub):
+    client = QuoteClient(base_url=stub.url, api_key="test", ttl=0.2, max_cached=2)
+
+    async def scenario():
+        for symbol in ("IBM", "AAPL", "MSFT"):
+            await client.get_quote(symbol)
+        assert list(client._cache) == ["AAPL", "MSFT"]
+        await asyncio.sleep(0.3)
+        await client.get_quote("TSLA")
+        assert list(client._cache) == ["TSLA"]
+
+    run(client, scenario())
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import aiosqlite
+from langchain_core.tools import BaseTool
+
+from codec import decode_payload, encode_payload
+
+# ---------------- Cache Policies ----------------
+# Seconds a result stays valid, per tool. Tools without a policy are never cached.
+# get_stock_price has none: QuoteClient caches and coalesces quotes itself.
+# The calculators have none either: they are pure and faster than a cache lookup.
+TOOL_CACHE_TTLS = {
+    "duckduckgo_search": 10 * 60,
+}
+# String arguments compared case-insensitively when building the cache key.
+CASEFOLD_ARGS = {
+    "duckduckgo_search": ("query",),
+}
+# Keys of a JSON result that mark it as an error or a rate-limit notice.
+UNCACHEABLE_KEYS = ("error", "Error Message", "Note", "Information")
+# Per-tool checks a result must also pass to be cached.
+RESULT_CHECKS = {
+    "duckduckgo_search": lambda content: "No good DuckDuckGo Search Result" not in str(content),
+}
+# MCP tools are cached only when the server declares them read-only with a
+# readOnlyHint annotation; a tool's name says nothing about its side effects.
+MCP_CACHE_TTL = 30
+# Results kept in memory per process, most recently used last.
+MAX_MEMORY_ENTRIES = 1024
+# The SQLite tier drops expired rows after this many writes.
+SQLITE_PURGE_EVERY = 200
+
+
+def _is_read_only(tool: BaseTool) -> bool:
+    metadata = tool.metadata or {}
+    hint = metadata.get("readOnlyHint", (metadata.get("annotations") or {}).get("readOnlyHint"))
+    return bool(hint)
+
+
+def _normalize(value, casefold: bool = False):
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return value.casefold() if casefold else value
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def tool_key(name: str, args: dict, casefold=()) -> str:
+    """Stable key for a call: arguments sorted, whitespace collapsed, `casefold` args compared case-insensitively."""
+    normalized = {k: _normalize(v, k in casefold) for k, v in sorted((args or {}).items())}
+    raw = json.dumps([name, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ToolResultCache:
+    """
+    Caches tool results by tool name and normalized arguments.
+
+    Lookups go to a per-process LRU first and then, when `db_path` is set, to
+    a SQLite table that several worker processes can share. Each tool has its
+    own TTL; tools without one (including side-effecting MCP tools) bypass the
+    cache entirely. Hits and misses are counted per tool.
+    """
+
+    def __init__(self, db_path: str | None = None, max_entries: int = MAX_MEMORY_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttls = dict(TOOL_CACHE_TTLS)
+        self.casefold = {name: set(args) for name, args in CASEFOLD_ARGS.items()}
+        self.result_checks = dict(RESULT_CHECKS)
+        self._memory: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._conn: aiosqlite.Connection | None = None
+        # Concurrent tool calls must not open the shared connection twice
+        self._conn_lock = asyncio.Lock()
+        self._writes = 0
+        self._stats: dict[str, dict[str, int]] = {}
+
+    # ---------------- Registry ----------------
+    def register(self, name: str, ttl: float, casefold_args: tuple[str, ...] = (), is_cacheable=None):
+        """Cache `name` for `ttl` seconds; `is_cacheable(content)` can reject results, e.g. empty ones."""
+        self.ttls[name] = ttl
+        self.casefold[name] = set(casefold_args)
+        if is_cacheable is not None:
+            self.result_checks[name] = is_cacheable
+
+    def exclude(self, name: str):
+        """Opt a tool out of caching, e.g. one with side effects."""
+        self.ttls.pop(name, None)
+
+    def register_mcp_tools(self, tools: list[BaseTool], ttl: float = MCP_CACHE_TTL):
+        for t in tools:
+            if _is_read_only(t):
+                self.register(t.name, ttl)
+            else:
+                self.exclude(t.name)
+
+    def cacheable(self, name: str) -> bool:
+        return name in self.ttls
+
+    def cacheable_result(self, name: str, content) -> bool:
+        """Errors and rate-limit notices are never cached, whether raised or returned as a payload."""
+        if isinstance(content, str) and content.startswith("{"):
+            try:
+                payload = json.loads(content)
+            except ValueError:
+                payload = None
+            if isinstance(payload, dict) and any(key in payload for key in UNCACHEABLE_KEYS):
+                return False
+        check = self.result_checks.get(name)
+        return check is None or bool(check(content))
+
+    def key(self, name: str, args: dict) -> str:
+        return tool_key(name, args, self.casefold.get(name, ()))
+
+    # ---------------- Tiers ----------------
+    async def _db(self) -> aiosqlite.Connection:
+        async with self._conn_lock:
+            if self._conn is None:
+                conn = await aiosqlite.connect(self.db_path)
+                await conn.execute("PRAGMA journal_mode=WAL")
+                await conn.execute('''
+                CREATE TABLE IF NOT EXISTS tool_cache (
+                    key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                ''')
+                await conn.commit()
+                self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, expires_at: float, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _count(self, name: str, outcome: str):
+        stats = self._stats.setdefault(name, {"memory_hits": 0, "sqlite_hits": 0, "misses": 0})
+        stats[outcome] += 1
+
+    async def get(self, name: str, args: dict):
+        """Return the cached result or None. Timestamps are wall-clock so processes agree on expiry."""
+        key = self.key(name, args)
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._memory.move_to_end(key)
+                self._count(name, "memory_hits")
+                return entry[1]
+            del self._memory[key]
+
+        if self.db_path:
+            conn = await self._db()
+            async with conn.execute("SELECT value, expires_at FROM tool_cache WHERE key=?", (key,)) as cursor:
+                row = await cursor.fetchone()
+            if row and row[1] > now:
+                try:
+                    value = decode_payload(row[0])
+                except ValueError:
+                    value = None
+                if value is not None:
+                    self._remember(key, row[1], value)
+                    self._count(name, "sqlite_hits")
+                    return value
+
+        self._count(name, "misses")
+        return None
+
+    async def put(self, name: str, args: dict, value):
+        ttl = self.ttls.get(name)
+        if ttl is None:
+            return
+        key = self.key(name, args)
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, value)
+        if not self.db_path:
+            return
+        conn = await self._db()
+        await conn.execute(
+            "INSERT OR REPLACE INTO tool_cache (key, tool, value, expires_at) VALUES (?, ?, ?, ?)",
+            (key, name, encode_payload(value), expires_at),
+        )
+        self._writes += 1
+        if self._writes % SQLITE_PURGE_EVERY == 0:
+            await conn.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (time.time(),))
+        await conn.commit()
+
+    def stats(self) -> dict:
+        """Per-tool hit counts and hit rate since the process started."""
+        result = {}
+        for name, stats in self._stats.items():
+            lookups = sum(stats.values())
+            result[name] = {**stats, "hit_rate": (stats["memory_hits"] + stats["sqlite_hits"]) / lookups if lookups else 0.0}
+        return result
+
+    async def aclose(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import BaseTool
+
+from single_flight import SingleFlight
+from tool_cache import CASEFOLD_ARGS, ToolResultCache, tool_key
+
+# ---------------- Limits ----------------
+# Tool calls of one AIMessage that may run at the same time.
+MAX_CONCURRENT_TOOLS = 4
+# Seconds a single call may take unless the tool has its own entry below.
+DEFAULT_TOOL_TIMEOUT = 20.0
+TOOL_TIMEOUTS = {
+    "duckduckgo_search": 15.0,
+    "get_stock_price": 10.0,
+    "calculator": 2.0,
+    "calculate_expression": 2.0,
+    "batch_calculator": 5.0,
+    "rag_tool": 20.0,
+}
+# Seconds all tool calls of one step may take together.
+TURN_TOOL_BUDGET = 45.0
+# Read-only tools whose identical concurrent calls share one execution, in
+# addition to every tool with a cache policy. Side-effecting tools never do,
+# and get_stock_price coalesces in QuoteClient instead.
+COALESCED_TOOLS = {"duckduckgo_search", "rag_tool"}
+
+
+class ToolLatency:
+    """Per-tool call counts, latency and timeout totals for this process."""
+
+    def __init__(self):
+        self._stats: dict[str, dict] = {}
+
+    def record(self, name: str, seconds: float, status: str):
+        stats = self._stats.setdefault(name, {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["calls"] += 1
+        stats["total_ms"] += seconds * 1000
+        stats["max_ms"] = max(stats["max_ms"], seconds * 1000)
+        if status == "timeout":
+            stats["timeouts"] += 1
+        elif status == "error":
+            stats["errors"] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            name: {**stats, "avg_ms": stats["total_ms"] / stats["calls"]}
+            for name, stats in self._stats.items()
+        }
+
+
+class ConcurrentToolNode:
+    """
+    Executes the tool calls of the last AIMessage concurrently.
+
+    At most `max_concurrency` calls run at once. Each call gets its tool's
+    timeout, capped by what is left of the step's overall budget; a call that
+    misses its deadline is answered with a structured timeout result so the
+    model still sees every other result. Results keep the order of the calls,
+    and each ToolMessage carries its latency in `response_metadata`.
+
+    `max_concurrent_tools` and `tool_turn_budget` in the run's configurable
+    override the defaults for a single run. With a `cache`, calls to tools that
+    have a cache policy are answered from it when possible, and successful
+    results are stored.
+
+    Identical concurrent calls to read-only tools, from any thread or user,
+    are coalesced into one execution whose result every caller receives.
+    """
+
+    def __init__(
+        self,
+        tools: list[BaseTool],
+        max_concurrency: int = MAX_CONCURRENT_TOOLS,
+        timeouts: dict[str, float] | None = None,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+        turn_budget: float = TURN_TOOL_BUDGET,
+        cache: ToolResultCache | None = None,
+    ):
+        self.tools_by_name = {t.name: t for t in tools}
+        self.max_concurrency = max_concurrency
+        self.timeouts = {**TOOL_TIMEOUTS, **(timeouts or {})}
+        self.default_timeout = default_timeout
+        self.turn_budget = turn_budget
+        self.latency = ToolLatency()
+        self.cache = cache
+        self.flights = SingleFlight()
+
+    def _result(self, call: dict, payload: dict, status: str, started: float) -> ToolMessage:
+        elapsed = time.perf_counter() - started
+        self.latency.record(call["name"], elapsed, status)
+        return ToolMessage(
+            content=json.dumps(payload),
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+            response_metadata={"latency_ms": round(elapsed * 1000, 1), "outcome": status},
+        )
+
+    async def _run_call(self, call: dict, config, semaphore: asyncio.Semaphore, deadline: float) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            started = time.perf_counter()
+            return self._result(call, {
+                "error": f"{call['name']} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].",
+            }, "error", started)
+
+        cacheable = self.cache is not None and self.cache.cacheable(call["name"])
+        if cacheable:
+            cached = await self.cache.get(call["name"], call["args"])
+            if cached is not None:
+                return ToolMessage(
+                    content=cached,
+                    name=call["name"],
+                    tool_call_id=call["id"],
+                    response_metadata={"latency_ms": 0.0, "outcome": "cached"},
+                )
+
+        async with semaphore:
+            started = time.perf_counter()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self._result(call, {
+                    "error": "Tool budget for this turn was used up before the call could start.",
+                    "tool": call["name"], "partial": True,
+                }, "timeout", started)
+            timeout = min(self.timeouts.get(call["name"], self.default_timeout), remaining)
+            try:
+                message, leader = await asyncio.wait_for(self._execute(tool, call, config, cacheable), timeout)
+            except asyncio.TimeoutError:
+                return self._result(call, {
+                    "error": f"{call['name']} did not answer within {timeout:.1f}s.",
+                    "tool": call["name"], "args": call["args"], "timeout_s": round(timeout, 1), "partial": True,
+                }, "timeout", started)
+            except Exception as e:
+                return self._result(call, {"error": f"Error: {e!r}\n Please fix your mistakes.", "tool": call["name"]}, "error", started)
+
+        elapsed = time.perf_counter() - started
+        self.latency.record(call["name"], elapsed, "ok")
+        if not isinstance(message, ToolMessage):
+            message = ToolMessage(content=str(message), name=call["name"], tool_call_id=call["id"])
+        # Coalesced callers get their own copy answering their own tool call
+        message = message.model_copy(update={
+            "tool_call_id": call["id"],
+            "response_metadata": {
+                **message.response_metadata,
+                "latency_ms": round(elapsed * 1000, 1),
+                "outcome": "ok" if leader else "coalesced",
+            },
+        })
+        if cacheable and leader and message.status != "error" and self.cache.cacheable_result(call["name"], message.content):
+            await self.cache.put(call["name"], call["args"], message.content)
+        return message
+
+    async def _execute(self, tool: BaseTool, call: dict, config, cacheable: bool):
+        """Invoke the tool, sharing the execution with identical in-flight calls when that is safe."""
+        def invoke():
+            return tool.ainvoke({**call, "type": "tool_call"}, config)
+
+        if not (cacheable or call["name"] in COALESCED_TOOLS):
+            return await invoke(), True
+        key = tool_key(call["name"], call["args"], CASEFOLD_ARGS.get(call["name"], ()))
+        return await self.flights.run(call["name"], key, invoke)
+
+    async def ainvoke(self, state: dict, config=None) -> dict:
+        message = next((m for m in reversed(state["messages"]) if isinstance(m, AIMessage)), None)
+        if message is None or not message.tool_calls:
+            return {"messages": []}
+        configurable = (config or {}).get("configurable", {})
+        semaphore = asyncio.Semaphore(configurable.get("max_concurrent_tools", self.max_concurrency))
+        deadline = time.monotonic() + configurable.get("tool_turn_budget", self.turn_budget)
+        results = await asyncio.gather(*(
+            self._run_call(call, config, semaphore, deadline) for call in message.tool_calls
+        ))
+        return {"messages": list(results)}
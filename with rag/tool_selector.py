@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from context_window import count_text
+
+# ---------------- Tool Selection ----------------
+# Tools bound per turn by relevance, on top of the always-on ones.
+TOP_K_TOOLS = 3
+ALWAYS_ON_TOOLS = ("calculate_expression",)
+# Below this best similarity the selector is unsure and binds every tool.
+MIN_RELEVANCE = 0.15
+# Bound model variants kept, most recently used last.
+MAX_BOUND_VARIANTS = 64
+# Share of text-only answers replayed with every tool bound to measure misses.
+# Each check is an extra paid model call, so they are off unless enabled.
+MISS_CHECK_RATE = float(os.getenv("TOOL_MISS_CHECK_RATE", "0"))
+# Threads whose last embedded query is kept.
+MAX_CACHED_QUERIES = 256
+# Replays running at once; further samples are skipped.
+MAX_MISS_CHECKS = 4
+
+
+class ToolSelector:
+    """
+    Binds only the tools relevant to the current turn instead of all of them.
+
+    Tool names and descriptions are embedded once; each turn the user's
+    message is embedded and the `top_k` most similar tools are bound, plus
+    the always-on tools and any tool already called in the turn. Bound model
+    variants are cached per tool set. Prompt tokens saved and fallbacks to
+    the full tool set are counted. With a `miss_check_rate` above zero,
+    misses are measured by replaying a sample of answers with every tool
+    bound (see `record_response`).
+    """
+
+    def __init__(self, llm, embeddings, tools: list[BaseTool], top_k: int = TOP_K_TOOLS, always_on=ALWAYS_ON_TOOLS,
+                 miss_check_rate: float = MISS_CHECK_RATE):
+        self.llm = llm
+        self.embeddings = embeddings
+        self.tools = list(tools)
+        self.top_k = top_k
+        self.always_on = {name for name in always_on if any(t.name == name for t in self.tools)}
+        self.miss_check_rate = miss_check_rate
+        self._checks: set[asyncio.Task] = set()
+        self._matrix: np.ndarray | None = None
+        self._variants: OrderedDict[frozenset, object] = OrderedDict()
+        # Each thread's turn query is embedded once, not again after every tool round
+        self._queries: OrderedDict[str | None, tuple[str, np.ndarray]] = OrderedDict()
+        # Prompt tokens each tool's schema adds to a request
+        self.schema_tokens = {t.name: count_text(json.dumps(convert_to_openai_tool(t))) for t in self.tools}
+        self._stats = {"turns": 0, "fallbacks": 0, "tokens_saved": 0, "miss_checks": 0, "misses": 0}
+
+    async def _tool_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            texts = [f"{t.name}: {t.description}" for t in self.tools]
+            vectors = np.asarray(await asyncio.to_thread(self.embeddings.embed_documents, texts), dtype=np.float32)
+            self._matrix = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return self._matrix
+
+    def _bound(self, names: frozenset):
+        variant = self._variants.get(names)
+        if variant is None:
+            variant = self.llm.bind_tools([t for t in self.tools if t.name in names])
+            self._variants[names] = variant
+            while len(self._variants) > MAX_BOUND_VARIANTS:
+                self._variants.popitem(last=False)
+        self._variants.move_to_end(names)
+        return variant
+
+    async def select(self, messages: list[BaseMessage], extra: tuple[str, ...] = (),
+                     thread_id: str | None = None) -> tuple[object, frozenset]:
+        """Return the model bound to the tools chosen for the turn in progress, and their names."""
+        start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        query = messages[start].content if start >= 0 else ""
+        if not self.tools or not isinstance(query, str) or not query.strip():
+            return self._bound(frozenset(t.name for t in self.tools)), frozenset(t.name for t in self.tools)
+
+        # Tools the model already called this turn stay bound for its follow-up
+        used = {c["name"] for m in messages[start:] if isinstance(m, AIMessage) for c in m.tool_calls}
+        matrix = await self._tool_matrix()
+        cached = self._queries.get(thread_id)
+        if cached is None or cached[0] != query:
+            vector = np.asarray(await asyncio.to_thread(self.embeddings.embed_query, query), dtype=np.float32)
+            cached = (query, vector / max(float(np.linalg.norm(vector)), 1e-12))
+            self._queries[thread_id] = cached
+            while len(self._queries) > MAX_CACHED_QUERIES:
+                self._queries.popitem(last=False)
+        self._queries.move_to_end(thread_id)
+        scores = matrix @ cached[1]
+
+        self._stats["turns"] += 1
+        if scores.max() < MIN_RELEVANCE:
+            self._stats["fallbacks"] += 1
+            names = frozenset(t.name for t in self.tools)
+        else:
+            ranked = [self.tools[i].name for i in np.argsort(-scores)[:self.top_k]]
+            names = frozenset({*ranked, *self.always_on, *used, *(n for n in extra if n in self.schema_tokens)})
+        self._stats["tokens_saved"] += sum(tokens for name, tokens in self.schema_tokens.items() if name not in names)
+        return self._bound(names), names
+
+    def record_response(self, response: AIMessage, bound: frozenset, messages: list[BaseMessage]):
+        """
+        Sample an answer given without any tool call while some tools were left
+        out, and replay its request in the background with every tool bound. A
+        replay that calls a tool that was not bound is a miss: the turn needed
+        a tool the selector did not offer.
+        """
+        if self.miss_check_rate <= 0 or response.tool_calls or len(bound) == len(self.tools):
+            return
+        if len(self._checks) >= MAX_MISS_CHECKS:
+            return
+        if random.random() >= self.miss_check_rate:
+            return
+        # A fresh context keeps the replay out of the UI's event stream
+        task = asyncio.create_task(self._check_miss(messages, bound), context=contextvars.Context())
+        self._checks.add(task)
+        task.add_done_callback(self._checks.discard)
+
+    async def _check_miss(self, messages: list[BaseMessage], bound: frozenset):
+        try:
+            replay = await self._bound(frozenset(t.name for t in self.tools)).ainvoke(messages)
+        except Exception as e:
+            print(f"Tool selection miss check failed: {e}")
+            return
+        self._stats["miss_checks"] += 1
+        if any(call["name"] not in bound for call in replay.tool_calls):
+            self._stats["misses"] += 1
+
+    def stats(self) -> dict:
+        turns, checks = self._stats["turns"], self._stats["miss_checks"]
+        return {
+            **self._stats,
+            "avg_tokens_saved": self._stats["tokens_saved"] / turns if turns else 0.0,
+            "miss_rate": self._stats["misses"] / checks if checks else 0.0,
+        }
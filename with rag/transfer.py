@@ -0,0 +1,331 @@
+"""
+Streaming export and import of users, conversations, messages and document
+metadata as NDJSON, with an optional tar archive of the FAISS indexes and tool
+output blobs the records refer to.
+
+Rows are read through cursors and written one record per line, and imports
+insert in batches inside large transactions, so memory stays bounded by the
+largest single conversation rather than by the size of the database.
+
+    python transfer.py export backup.ndjson [--user NAME] [--archive files.tar] [--include-credentials]
+    python transfer.py import backup.ndjson [--archive files.tar]
+
+Password hashes are only exported with --include-credentials; users exported
+without them are not recreated on import and have to register again. Large
+tool outputs live in the blob store: with --archive the blobs are archived and
+messages keep their references, without it the full outputs are written
+inline into the message records.
+
+Imports are only run from this command line, against a stopped app: the
+running backend keeps hot threads and delta bases in memory, and its
+connection's transactions would interleave with the import's. Exports are
+safe while the app runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tarfile
+
+import aiosqlite
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langgraph.checkpoint.base import empty_checkpoint
+
+from blob_store import BLOB_DIR, BLOB_REF_KEY, _blob_path, rehydrate
+from codec import CompressedSerializer, decode_payload, encode_payload
+from database import init_db
+from delta_checkpointer import DeltaSqliteSaver
+
+FORMAT_VERSION = 1
+# Rows sent to executemany at once on import.
+BATCH_SIZE = 500
+# Rows written between commits on import.
+TRANSACTION_ROWS = 20000
+# Export records encoded and written per worker-thread hop.
+WRITE_CHUNK = 256
+# Archive members are only extracted under these directories.
+ARCHIVE_DIRS = ("vectorstores", BLOB_DIR)
+
+STATE_CHANNELS = ("summary", "summarized_through")
+
+
+def _saver(checkpointer):
+    return getattr(checkpointer, "saver", checkpointer)
+
+
+# ---------------- Export ----------------
+async def _inline_blob(message):
+    """The message with its externalized tool output loaded back in and the blob reference dropped."""
+    full = await rehydrate(message)
+    if full is message:
+        return message
+    kwargs = {k: v for k, v in full.additional_kwargs.items() if k != BLOB_REF_KEY}
+    return full.model_copy(update={"additional_kwargs": kwargs})
+
+
+async def iter_records(conn: aiosqlite.Connection, checkpointer, username: str | None = None,
+                       include_credentials: bool = False, inline_blobs: bool = True):
+    """
+    Yield export records one at a time: a header, then users, then for every
+    conversation its metadata, document, summary state and messages.
+    Password hashes are left out unless `include_credentials`. With
+    `inline_blobs`, externalized tool outputs are written into their message
+    records instead of as blob references.
+    """
+    # Read through the SQLite saver, so exporting does not pull every thread into the hot cache
+    saver = _saver(checkpointer)
+    yield {"type": "header", "version": FORMAT_VERSION}
+    where, params = ("WHERE username=?", (username,)) if username else ("", ())
+
+    # aiosqlite cursors fetch in small chunks when iterated, never the whole result
+    async with conn.execute(f"SELECT username, password_hash, ai_count, last_reset FROM users {where}", params) as cursor:
+        async for name, password_hash, ai_count, last_reset in cursor:
+            record = {"type": "user", "username": name, "ai_count": ai_count, "last_reset": last_reset}
+            if include_credentials:
+                record["password_hash"] = password_hash
+            yield record
+
+    async with conn.execute(
+        f"SELECT thread_id, username, conversation_name, created_at, updated_at, message_count FROM conversations {where} ORDER BY rowid",
+        params,
+    ) as cursor:
+        async for thread_id, name, conversation_name, created_at, updated_at, message_count in cursor:
+            yield {
+                "type": "conversation", "thread_id": thread_id, "username": name, "conversation_name": conversation_name,
+                "created_at": created_at, "updated_at": updated_at, "message_count": message_count,
+            }
+            async with conn.execute(
+                "SELECT filename, vectorstore_path, doc_info FROM documents WHERE thread_id=?", (thread_id,)
+            ) as doc_cursor:
+                document = await doc_cursor.fetchone()
+            if document:
+                filename, vectorstore_path, doc_info = document
+                try:
+                    doc_info = decode_payload(doc_info) if doc_info else {}
+                except ValueError:
+                    doc_info = {}
+                yield {"type": "document", "thread_id": thread_id, "filename": filename, "vectorstore_path": vectorstore_path, "doc_info": doc_info}
+
+            # Only the latest checkpoint is exported; older ones are history of the graph, not of the chat
+            if saver is not checkpointer:
+                await checkpointer.await_writes(thread_id)
+            checkpoint_tuple = await saver.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+            if checkpoint_tuple is None:
+                continue
+            values = checkpoint_tuple.checkpoint["channel_values"]
+            state = {key: values[key] for key in STATE_CHANNELS if key in values}
+            if state:
+                yield {"type": "state", "thread_id": thread_id, **state}
+            for index, message in enumerate(values.get("messages", [])):
+                if inline_blobs:
+                    message = await _inline_blob(message)
+                yield {"type": "message", "thread_id": thread_id, "index": index, "message": messages_to_dict([message])[0]}
+
+
+def _archive_add(archive: tarfile.TarFile, path: str, added: set):
+    if path in added or not os.path.exists(path):
+        return
+    archive.add(path, arcname=os.path.relpath(path))
+    added.add(path)
+
+
+def _write_records(out, records: list[dict]):
+    out.writelines(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+
+
+async def export_ndjson(conn: aiosqlite.Connection, checkpointer, out_path: str, username: str | None = None,
+                        archive_path: str | None = None, include_credentials: bool = False) -> dict:
+    """
+    Write an export to `out_path`, and the files it references to
+    `archive_path` if given; without an archive, tool output blobs are
+    inlined. Encoding and file I/O run in worker threads, a chunk of records
+    at a time. Returns record counts.
+    """
+    counts = {}
+    added = set()
+    chunk = []
+    out = await asyncio.to_thread(open, out_path, "w", encoding="utf-8")
+    archive = await asyncio.to_thread(tarfile.open, archive_path, "w|") if archive_path else None
+    try:
+        async for record in iter_records(conn, checkpointer, username, include_credentials, inline_blobs=archive is None):
+            chunk.append(record)
+            if len(chunk) >= WRITE_CHUNK:
+                await asyncio.to_thread(_write_records, out, chunk)
+                chunk = []
+            counts[record["type"]] = counts.get(record["type"], 0) + 1
+            if archive is None:
+                continue
+            if record["type"] == "document":
+                await asyncio.to_thread(_archive_add, archive, record["vectorstore_path"], added)
+            elif record["type"] == "message":
+                digest = record["message"]["data"].get("additional_kwargs", {}).get(BLOB_REF_KEY)
+                if digest:
+                    await asyncio.to_thread(_archive_add, archive, _blob_path(digest), added)
+        await asyncio.to_thread(_write_records, out, chunk)
+    finally:
+        await asyncio.to_thread(out.close)
+        if archive is not None:
+            await asyncio.to_thread(archive.close)
+    counts["files"] = len(added)
+    return counts
+
+
+# ---------------- Import ----------------
+INSERTS = {
+    "user": "INSERT OR IGNORE INTO users (username, password_hash, ai_count, last_reset) VALUES (?, ?, ?, ?)",
+    "conversation": "INSERT OR IGNORE INTO conversations (thread_id, username, conversation_name, created_at, updated_at, message_count) VALUES (?, ?, ?, ?, ?, ?)",
+    "document": "INSERT OR IGNORE INTO documents (thread_id, filename, vectorstore_path, doc_info) VALUES (?, ?, ?, ?)",
+    "checkpoint": "INSERT OR IGNORE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, '', ?, NULL, ?, ?, ?)",
+}
+
+
+class _BatchWriter:
+    """Buffers rows per statement, runs them with executemany and commits every TRANSACTION_ROWS rows."""
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self.conn = conn
+        self.pending = {kind: [] for kind in INSERTS}
+        self.uncommitted = 0
+        self.counts = {kind: 0 for kind in INSERTS}
+
+    async def add(self, kind: str, row: tuple):
+        self.pending[kind].append(row)
+        if len(self.pending[kind]) >= BATCH_SIZE:
+            await self._run(kind)
+        if self.uncommitted >= TRANSACTION_ROWS:
+            await self.conn.commit()
+            self.uncommitted = 0
+
+    async def _run(self, kind: str):
+        rows, self.pending[kind] = self.pending[kind], []
+        if rows:
+            cursor = await self.conn.executemany(INSERTS[kind], rows)
+            self.uncommitted += len(rows)
+            # Rows skipped by INSERT OR IGNORE are not counted
+            self.counts[kind] += max(cursor.rowcount, 0)
+            await cursor.close()
+
+    async def flush(self):
+        # Parents first, so a batch never references a row still buffered
+        for kind in INSERTS:
+            await self._run(kind)
+        await self.conn.commit()
+        self.uncommitted = 0
+
+
+async def _thread_exists(conn: aiosqlite.Connection, thread_id: str) -> bool:
+    async with conn.execute("SELECT 1 FROM checkpoints WHERE thread_id=? LIMIT 1", (thread_id,)) as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def _checkpoint_row(conn: aiosqlite.Connection, saver, thread_id: str, messages: list, state: dict):
+    """Build a full-snapshot checkpoint row holding the imported messages, unless the thread already has checkpoints."""
+    if await _thread_exists(conn, thread_id):
+        return None
+    checkpoint = empty_checkpoint()
+    channel_values = {"messages": messages_from_dict(messages), **state}
+    checkpoint["channel_values"] = channel_values
+    checkpoint["channel_versions"] = {key: saver.get_next_version(None, None) for key in channel_values}
+    metadata = {"source": "update", "step": -1, "parents": {}}
+    return (thread_id, checkpoint["id"], *saver.serde.dumps_typed(checkpoint), saver.jsonplus_serde.dumps(metadata))
+
+
+async def import_ndjson(conn: aiosqlite.Connection, checkpointer, in_path: str, archive_path: str | None = None) -> dict:
+    """
+    Load an export into the database. Existing users, conversations and
+    threads are left untouched. Returns the number of rows inserted per table.
+    """
+    saver = _saver(checkpointer)
+    await saver.setup()
+    writer = _BatchWriter(conn)
+    # Messages of the conversation being read; written as one checkpoint when it ends
+    thread_id, messages, state = None, [], {}
+
+    async def finish_thread():
+        if thread_id is not None and (messages or state):
+            row = await _checkpoint_row(conn, saver, thread_id, messages, state)
+            if row is not None:
+                await writer.add("checkpoint", row)
+
+    with open(in_path, encoding="utf-8") as source:
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            kind = record.get("type")
+            if kind == "header":
+                if record.get("version") != FORMAT_VERSION:
+                    raise ValueError(f"Unsupported export version {record.get('version')}")
+            elif kind == "user":
+                # Exported without credentials; the user registers again
+                if "password_hash" not in record:
+                    continue
+                await writer.add("user", (record["username"], record["password_hash"], record["ai_count"], record["last_reset"]))
+            elif kind == "conversation":
+                await finish_thread()
+                thread_id, messages, state = record["thread_id"], [], {}
+                await writer.add("conversation", (
+                    thread_id, record["username"], record["conversation_name"],
+                    record["created_at"], record["updated_at"], record["message_count"],
+                ))
+            elif kind == "document":
+                await writer.add("document", (record["thread_id"], record["filename"], record["vectorstore_path"], encode_payload(record["doc_info"])))
+            elif kind == "state" and record["thread_id"] == thread_id:
+                state = {key: record[key] for key in STATE_CHANNELS if key in record}
+            elif kind == "message" and record["thread_id"] == thread_id:
+                messages.append(record["message"])
+            else:
+                raise ValueError(f"Unexpected record on line {line_number}: {kind}")
+        await finish_thread()
+    await writer.flush()
+
+    counts = dict(writer.counts)
+    if archive_path:
+        counts["files"] = await asyncio.to_thread(_extract_archive, archive_path)
+    return counts
+
+
+def _extract_archive(archive_path: str) -> int:
+    extracted = 0
+    with tarfile.open(archive_path, "r|") as archive:
+        for member in archive:
+            top = member.name.split("/", 1)[0]
+            if top not in ARCHIVE_DIRS:
+                continue
+            archive.extract(member, filter="data")
+            extracted += member.isfile()
+    return extracted
+
+
+# ---------------- Command line ----------------
+async def main(args):
+    conn = await aiosqlite.connect(args.db)
+    try:
+        await init_db(conn)
+        checkpointer = DeltaSqliteSaver(conn, serde=CompressedSerializer())
+        await checkpointer.setup()
+        if args.command == "export":
+            counts = await export_ndjson(conn, checkpointer, args.path, args.user, args.archive, args.include_credentials)
+        else:
+            counts = await import_ndjson(conn, checkpointer, args.path, args.archive)
+        print(counts)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import chatbot data as NDJSON.")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="NDJSON file to write or read")
+    parser.add_argument("--db", default="chatbot.db")
+    parser.add_argument("--user", help="Export only this user's data")
+    parser.add_argument(
+        "--archive",
+        help="Tar file with the vector stores and tool blobs. Without it, exports inline full tool outputs "
+             "into the messages and leave the vector stores out.",
+    )
+    parser.add_argument(
+        "--include-credentials", action="store_true",
+        help="Export users' password hashes, so imported users can log in with their old passwords",
+    )
+    asyncio.run(main(parser.parse_args()))
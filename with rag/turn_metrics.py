@@ -0,0 +1,162 @@
+import asyncio
+import json
+import time
+
+import aiosqlite
+
+# ---------------- Turn Metrics ----------------
+# Rows buffered before new ones are dropped; metrics must never slow a turn.
+MAX_PENDING_ROWS = 10_000
+# Rows written per executemany / commit.
+WRITE_BATCH = 500
+# USD per million (input, output) tokens, used for the cost estimate.
+MODEL_PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+COLUMNS = (
+    "turn_id", "thread_id", "username", "node", "created_at", "wall_ms", "ttft_ms",
+    "input_tokens", "output_tokens", "cached_tokens", "cost_usd",
+    "tool_name", "tool_latency_ms", "retrieved_chunks", "retrieved_chars", "outcome",
+)
+
+
+def estimate_cost(model: str | None, input_tokens: int, output_tokens: int) -> float | None:
+    prices = next((p for name, p in MODEL_PRICES.items() if model and model.startswith(name)), None)
+    if prices is None:
+        return None
+    return (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+
+
+def usage_row(response, ttft_ms: float | None, wall_ms: float) -> dict:
+    """Token, latency and cost fields of a chat_node row, from the model response's usage metadata."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0)
+    output_tokens = usage.get("output_tokens", 0)
+    model = (getattr(response, "response_metadata", None) or {}).get("model_name")
+    return {
+        "wall_ms": wall_ms,
+        "ttft_ms": ttft_ms,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0),
+        "cost_usd": estimate_cost(model, input_tokens, output_tokens),
+    }
+
+
+def tool_row(message) -> dict:
+    """Latency and retrieval size fields of a tool row, from a ToolMessage produced by the tool node."""
+    row = {
+        "tool_name": message.name,
+        "tool_latency_ms": message.response_metadata.get("latency_ms"),
+        "outcome": message.response_metadata.get("outcome"),
+    }
+    if message.name == "rag_tool" and isinstance(message.content, str):
+        try:
+            context = json.loads(message.content).get("context") or []
+        except (ValueError, AttributeError):
+            context = []
+        row["retrieved_chunks"] = len(context)
+        row["retrieved_chars"] = sum(len(chunk) for chunk in context)
+    return row
+
+
+class MetricsWriter:
+    """
+    Buffers metric rows in memory and writes them to turn_metrics from one
+    background task, in batches. `record()` never awaits, so graph nodes only
+    pay for a queue append. `conn` and `lock` are attached by create_agent;
+    the lock is the checkpointer's, so metric commits never interleave with a
+    checkpoint or compaction transaction on the shared connection.
+    """
+
+    def __init__(self):
+        self.conn: aiosqlite.Connection | None = None
+        self.lock: asyncio.Lock | None = None
+        self.dropped = 0
+        self._queue: asyncio.Queue | None = None
+        self._writer: asyncio.Task | None = None
+
+    def record(self, config, node: str, **fields):
+        if self.conn is None:
+            return
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue(maxsize=MAX_PENDING_ROWS)
+            self._writer = asyncio.create_task(self._drain())
+        configurable = (config or {}).get("configurable", {})
+        row = {
+            "turn_id": configurable.get("turn_id"),
+            "thread_id": configurable.get("thread_id"),
+            "username": configurable.get("username"),
+            "node": node,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+            **fields,
+        }
+        try:
+            self._queue.put_nowait(tuple(row.get(column) for column in COLUMNS))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _drain(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < WRITE_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                async with self.lock:
+                    await self.conn.executemany(
+                        f"INSERT INTO turn_metrics ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        batch,
+                    )
+                    await self.conn.commit()
+            except Exception as e:
+                print(f"Failed to write {len(batch)} metric rows: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def aflush(self):
+        if self._queue is not None and self._writer is not None and not self._writer.done():
+            await self._queue.join()
+
+
+# ---------------- Aggregates ----------------
+_AGGREGATES = '''
+    COUNT(DISTINCT turn_id) AS turns,
+    SUM(node = 'chat_node') AS model_calls,
+    SUM(node = 'chat_node' AND outcome = 'failed') AS failed_model_calls,
+    AVG(CASE WHEN node = 'chat_node' THEN wall_ms END) AS avg_model_ms,
+    MAX(CASE WHEN node = 'chat_node' THEN wall_ms END) AS max_model_ms,
+    AVG(ttft_ms) AS avg_ttft_ms,
+    COALESCE(SUM(input_tokens), 0) AS input_tokens,
+    COALESCE(SUM(output_tokens), 0) AS output_tokens,
+    COALESCE(SUM(cached_tokens), 0) AS cached_tokens,
+    COALESCE(SUM(cost_usd), 0) AS cost_usd,
+    SUM(node = 'tools') AS tool_calls,
+    AVG(tool_latency_ms) AS avg_tool_ms,
+    SUM(outcome = 'timeout') AS tool_timeouts
+'''
+
+
+async def _aggregate(conn: aiosqlite.Connection, group_by: str, where: str, params: tuple) -> list[dict]:
+    async with conn.execute(
+        f"SELECT {group_by} AS key, {_AGGREGATES} FROM turn_metrics WHERE {where} GROUP BY {group_by} ORDER BY key",
+        params,
+    ) as cursor:
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in await cursor.fetchall()]
+
+
+async def metrics_by_user(conn: aiosqlite.Connection, days: int = 7) -> list[dict]:
+    return await _aggregate(conn, "username", "created_at >= datetime('now', ?)", (f"-{days} days",))
+
+
+async def metrics_by_thread(conn: aiosqlite.Connection, username: str, days: int = 7) -> list[dict]:
+    return await _aggregate(conn, "thread_id", "username = ? AND created_at >= datetime('now', ?)", (username, f"-{days} days"))
+
+
+async def metrics_by_day(conn: aiosqlite.Connection, days: int = 30) -> list[dict]:
+    return await _aggregate(conn, "date(created_at)", "created_at >= datetime('now', ?)", (f"-{days} days",))
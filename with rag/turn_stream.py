@@ -0,0 +1,126 @@
+import asyncio
+import contextlib
+import json
+import sys
+from collections.abc import AsyncIterator
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+from run_control import RunHandle
+
+# ---------------- Turn Streaming ----------------
+# Only tokens generated inside these nodes reach the UI (not the summarizer's).
+TOKEN_NODES = ("chat_node",)
+# Stands in for the answer of a turn stopped before any token was streamed.
+STOPPED_REPLY = "_Stopped before answering._"
+
+
+async def stream_turn(graph, user_input: str, config: dict, run: RunHandle | None = None,
+                      memory=None) -> AsyncIterator[tuple[str, object]]:
+    """
+    Run one turn and yield only what the UI renders:
+
+        ("token", text)                          model token deltas from chat_node
+        ("tool_start", name)                     a tool call requested by the model
+        ("tool_end", {"name": ..., "outcome": ...})  a tool result
+
+    Uses the graph's `messages` and `updates` stream modes rather than
+    astream_events, so no event is built for chains, prompts or tools that
+    the UI would discard. Returns once the turn's checkpoints are on disk.
+
+    Cancelling the task that consumes this stream cancels the run and its
+    in-flight tool calls; the thread is then settled with the partial answer
+    (see settle_cancelled_turn) and `run.report` says what was cut short.
+
+    With a SummaryMemory as `memory`, the run holds the thread's lock, and
+    folding older turns into the summary is scheduled once the turn is on disk.
+    """
+    thread_id = config["configurable"]["thread_id"]
+    run = run or RunHandle(thread_id)
+    # Text streamed by the chat_node call in progress, i.e. not yet in a checkpoint
+    partial = []
+    async with memory.lock(thread_id) if memory is not None else contextlib.nullcontext():
+        try:
+            async for mode, payload in graph.astream(
+                {"messages": [HumanMessage(content=user_input)]},
+                config=config,
+                stream_mode=["messages", "updates"],
+            ):
+                if mode == "messages":
+                    chunk, metadata = payload
+                    if isinstance(chunk, AIMessageChunk) and chunk.content and metadata.get("langgraph_node") in TOKEN_NODES:
+                        run.tokens_streamed += 1
+                        partial.append(chunk.content if isinstance(chunk.content, str) else "")
+                        yield "token", chunk.content
+                    continue
+
+                for node, update in payload.items():
+                    messages = (update or {}).get("messages", []) if isinstance(update, dict) else []
+                    if node == "chat_node":
+                        partial.clear()
+                        for message in messages:
+                            for call in getattr(message, "tool_calls", None) or []:
+                                run.tool_calls_started += 1
+                                yield "tool_start", call["name"]
+                    elif node == "tools":
+                        for message in messages:
+                            if isinstance(message, ToolMessage):
+                                run.tool_calls_finished += 1
+                                yield "tool_end", {"name": message.name, "outcome": message.response_metadata.get("outcome")}
+        except asyncio.CancelledError:
+            in_flight = run.tool_calls_started - run.tool_calls_finished
+            run.report = {
+                "tokens_streamed": run.tokens_streamed,
+                "tool_calls_cancelled": in_flight,
+                # Stopping during tool calls also skips the model call that would read their results
+                "model_calls_avoided": 1 if in_flight else 0,
+            }
+            await settle_cancelled_turn(graph, config, "".join(partial))
+            raise
+        finally:
+            # The CancelledError of a stopped turn, or any other error, that must not be masked
+            in_flight = sys.exc_info()[1]
+            # The turn is complete only once its checkpoints are on disk
+            try:
+                await graph.checkpointer.aflush(thread_id)
+            except RuntimeError as e:
+                print(f"Turn on thread {thread_id} was not fully saved: {e}")
+                if in_flight is None:
+                    raise
+            if memory is not None:
+                # Runs once the lock is released, so it never writes into this run
+                memory.schedule(thread_id)
+
+
+async def settle_cancelled_turn(graph, config: dict, partial: str):
+    """
+    Leave a stopped turn in a state the model can continue from. Tool calls
+    without a result get a "cancelled" ToolMessage, and a turn without a final
+    answer gets one: the text streamed so far, or STOPPED_REPLY. A turn
+    stopped after its answer was checkpointed is left as it is.
+    """
+    state = await graph.aget_state(config)
+    messages = state.values.get("messages", [])
+    start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=len(messages))
+    turn = messages[start:]
+    if turn and isinstance(turn[-1], AIMessage) and not turn[-1].tool_calls:
+        return
+
+    answered = {m.tool_call_id for m in turn if isinstance(m, ToolMessage)}
+    settle = [
+        ToolMessage(
+            content=json.dumps({"error": "Cancelled by the user before the tool finished.", "tool": call["name"], "cancelled": True}),
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+            response_metadata={"outcome": "cancelled"},
+        )
+        for m in turn if isinstance(m, AIMessage)
+        for call in m.tool_calls if call["id"] not in answered
+    ]
+    settle.append(AIMessage(
+        content=f"{partial} …" if partial.strip() else STOPPED_REPLY,
+        response_metadata={"answered_by": "cancelled"},
+    ))
+    # Written as chat_node's final answer, so the thread has nothing left to run
+    await graph.aupdate_state(config, {"messages": settle}, as_node="chat_node")